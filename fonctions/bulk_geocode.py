@@ -0,0 +1,136 @@
+"""Chunked geocoding of large CSV files, streamed from input to output files.
+
+Nothing is accumulated in memory: rows are read chunk by chunk, geocoded and written
+straight to the results CSV, the results GeoJSON and the rejected-rows report.
+"""
+import csv
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+RESULT_COLUMNS = ['latitude', 'longitude', 'match_type', 'address']
+REJECTED_COLUMNS = ['row_number', 'value', 'reason']
+REASON_EMPTY = 'empty'
+REASON_NOT_FOUND = 'not_found'
+
+
+def iter_chunks(reader, chunk_size):
+    """Lists of (row_number, row) of at most chunk_size rows; row_number counts data rows from 1."""
+    numbered = enumerate(reader, start=1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkResultWriter:
+    """Writes geocoding results to results.csv, results.geojson and rejected.csv in out_dir."""
+
+    def __init__(self, out_dir, fieldnames):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.results_csv = self.out_dir / 'results.csv'
+        self.results_geojson = self.out_dir / 'results.geojson'
+        self.rejected_csv = self.out_dir / 'rejected.csv'
+        self.resolved = 0
+        self.rejected = 0
+
+        self._csv_file = open(self.results_csv, 'w', newline='', encoding='utf-8')
+        self._csv = csv.DictWriter(self._csv_file, fieldnames=[*fieldnames, *RESULT_COLUMNS], extrasaction='ignore')
+        self._csv.writeheader()
+        self._rejected_file = open(self.rejected_csv, 'w', newline='', encoding='utf-8')
+        self._rejected = csv.writer(self._rejected_file)
+        self._rejected.writerow(REJECTED_COLUMNS)
+        # GeoJSON écrit au fil de l'eau: en-tête, features séparées par des virgules, puis fermeture
+        self._geojson_file = open(self.results_geojson, 'w', encoding='utf-8')
+        self._geojson_file.write('{"type": "FeatureCollection", "features": [\n')
+
+    def write(self, row_number, row, value, location):
+        if not location:
+            self.rejected += 1
+            self._rejected.writerow([row_number, value, REASON_EMPTY if not value.strip() else REASON_NOT_FOUND])
+            return
+
+        address = location['address'].replace('<br>', ' - ')
+        self._csv.writerow({
+            **row,
+            'latitude': location['lat'],
+            'longitude': location['lon'],
+            'match_type': location['type'],
+            'address': address,
+        })
+        feature = {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [location['lon'], location['lat']]},
+            'properties': {'row_number': row_number, 'value': value, 'match_type': location['type'], 'address': address},
+        }
+        if self.resolved:
+            self._geojson_file.write(',\n')
+        self._geojson_file.write(json.dumps(feature, ensure_ascii=False))
+        self.resolved += 1
+
+    def close(self):
+        self._geojson_file.write('\n]}\n')
+        for f in (self._csv_file, self._rejected_file, self._geojson_file):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def geocode_csv_stream(text_stream, column, geocode, writer, chunk_size=5000, dialect=None):
+    """Geocode text_stream's `column` chunk by chunk with geocode(value) -> location dict or None.
+
+    Yields (rows_done, chunk_rows, chunk_seconds) after each chunk, so callers can report
+    progress and throughput while the file is still being processed.
+    """
+    reader = csv.DictReader(text_stream, dialect=dialect or csv.excel)
+    rows_done = 0
+    for chunk in iter_chunks(reader, chunk_size):
+        start = time.perf_counter()
+        for row_number, row in chunk:
+            value = (row.get(column) or '').strip()
+            writer.write(row_number, row, value, geocode(value) if value else None)
+        rows_done += len(chunk)
+        yield rows_done, len(chunk), time.perf_counter() - start
+
+
+def geocode_csv_parallel(text_stream, column, geocode_values, writer, workers, chunk_size=5000,
+                         dialect=None, initializer=None, initargs=()):
+    """Process-pool version of geocode_csv_stream.
+
+    geocode_values(values) -> list of locations must be a picklable module-level function;
+    initializer(*initargs) runs once per worker process. Only the column values are sent
+    to the workers and results are written in input order. At most 2 chunks per worker
+    are in flight, so memory stays bounded whatever the file size.
+
+    Yields (rows_done, chunk_rows, seconds_since_start) after each written chunk.
+    """
+    reader = csv.DictReader(text_stream, dialect=dialect or csv.excel)
+    chunks = iter_chunks(reader, chunk_size)
+    pending = deque()
+    rows_done = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                values = [(row.get(column) or '').strip() for _, row in chunk]
+                pending.append((chunk, values, executor.submit(geocode_values, values)))
+            if not pending:
+                return
+
+            chunk, values, future = pending.popleft()
+            for (row_number, row), value, location in zip(chunk, values, future.result()):
+                writer.write(row_number, row, value, location)
+            rows_done += len(chunk)
+            yield rows_done, len(chunk), time.perf_counter() - start
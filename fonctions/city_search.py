@@ -0,0 +1,77 @@
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+CityMatch = namedtuple('CityMatch', ['key', 'score'])
+
+
+def trigrams(text):
+    """Set of 3-character windows of text, padded so that short words and word starts count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index trigram -> ids of the names containing it, for typo-tolerant lookups.
+
+    A query only touches the posting lists of its own trigrams (a few dozen small arrays),
+    then scores the candidates with the Dice coefficient of the trigram sets; no edit
+    distance is computed against the full list of names.
+
+    The posting lists are flat arrays (sorted trigrams, offsets, concatenated ids), so an
+    index can be saved with arrays() and reopened from memory-mapped files without
+    rebuilding it (see fonctions.postal_columns).
+    """
+
+    def __init__(self, names, sizes=None, grams=None, offsets=None, ids=None):
+        self.names = names
+        if grams is None:
+            sizes, grams, offsets, ids = self._build(names)
+        self._sizes = sizes
+        self._grams = grams
+        self._offsets = offsets
+        self._ids = ids
+
+    @staticmethod
+    def _build(names):
+        postings = defaultdict(list)
+        sizes = np.empty(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            grams = trigrams(name)
+            sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        # La liste du trigramme grams[k] est ids[offsets[k]:offsets[k + 1]]
+        keys = sorted(postings)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(postings[gram]) for gram in keys], out=offsets[1:])
+        ids = np.fromiter((i for gram in keys for i in postings[gram]), dtype=np.int32, count=int(offsets[-1]))
+        return sizes, np.array(keys, dtype='U3'), offsets, ids
+
+    def arrays(self):
+        """{name: array} to save; passed back as keyword arguments, they rebuild the same index."""
+        return {'sizes': self._sizes, 'grams': self._grams, 'offsets': self._offsets, 'ids': self._ids}
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def search(self, text, limit=5, min_score=0.0):
+        """Best CityMatch(key, score) for text, score in [0, 1] (1 = same trigrams), best first."""
+        grams = trigrams(text)
+        query = np.array(sorted(grams), dtype='U3')
+        positions = np.searchsorted(self._grams, query)
+        known = positions < len(self._grams)
+        known[known] = self._grams[positions[known]] == query[known]
+        lists = [self._ids[self._offsets[k]:self._offsets[k + 1]] for k in positions[known].tolist()]
+        if not lists:
+            return []
+        ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        scores = 2 * shared / (len(grams) + self._sizes[ids])
+        keep = scores >= min_score
+        ids, scores = ids[keep], scores[keep]
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return [CityMatch(str(self.names[i]), float(score)) for i, score in zip(ids[best].tolist(), scores[best].tolist())]
@@ -0,0 +1,23 @@
+"""CSV helpers shared by the file imports (bulk geocoding, inventory)."""
+import codecs
+import csv
+
+# Repli pour les fichiers qui ne sont pas en UTF-8: exports Excel en français
+FALLBACK_ENCODING = 'cp1252'
+
+
+def sniff_dialect(sample):
+    """csv dialect of a text sample, falling back to the default comma-separated dialect."""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        return csv.excel
+
+
+def detect_encoding(sample):
+    """'utf-8-sig' if the bytes sample decodes as UTF-8 (a character cut at the end is fine), else FALLBACK_ENCODING."""
+    try:
+        codecs.getincrementaldecoder('utf-8-sig')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8-sig'
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from fonctions.postal_index import normalize_location_line
+from fonctions.sqlite_pool import ConnectionPool
+
+_MISSING = object()
+
+
+def normalize_cache_key(identifier):
+    """Cache key of an identifier: the normalized line, case-folded (the cached location does not depend on case)."""
+    return normalize_location_line(identifier).casefold()
+
+
+class GeocodeCache:
+    """Two-tier geocoding cache: a bounded in-process LRU in front of a persistent SQLite table.
+
+    Values are location dicts, or None for "not found" (negative results are cached too).
+    Disk entries carry the dataset version they were computed with; entries from another
+    version are purged when the cache is opened. Shared by worker threads: the lock only
+    guards the in-memory LRU and the counters, disk reads and writes go through a pool of
+    WAL connections (one per concurrent caller), so threads do not wait on each other's I/O.
+    """
+
+    def __init__(self, db_path, dataset_version, max_entries=10000):
+        self.db_path = db_path
+        self.dataset_version = dataset_version
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ConnectionPool(self._connect)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._pool.connection() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS geocode_cache (
+                        key TEXT PRIMARY KEY,
+                        dataset_version TEXT NOT NULL,
+                        location TEXT
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('DELETE FROM geocode_cache WHERE dataset_version != ?', (dataset_version,))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key, value):
+        # Caller holds the lock
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys):
+        """{key: value} for the keys found in memory or on disk; missing keys are left out."""
+        found = {}
+        pending = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value = self._memory.get(key, _MISSING)
+                if value is _MISSING:
+                    pending.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+                    self.memory_hits += 1
+        if not pending:
+            return found
+
+        from_disk = {}
+        with self._pool.connection() as conn:
+            for i in range(0, len(pending), 500):
+                chunk = pending[i:i+500]
+                rows = conn.execute(
+                    f"SELECT key, location FROM geocode_cache "
+                    f"WHERE dataset_version = ? AND key IN ({', '.join('?' * len(chunk))})",
+                    [self.dataset_version, *chunk]
+                ).fetchall()
+                for key, location in rows:
+                    from_disk[key] = json.loads(location) if location is not None else None
+
+        with self._lock:
+            for key, value in from_disk.items():
+                self._remember(key, value)
+            self.disk_hits += len(from_disk)
+            self.misses += len(pending) - len(from_disk)
+        found.update(from_disk)
+        return found
+
+    def put_many(self, items):
+        """Store {key: value} in memory and on disk (one transaction)."""
+        items = dict(items)
+        if not items:
+            return
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+        with self._pool.connection() as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?)',
+                (
+                    (key, self.dataset_version, json.dumps(value) if value is not None else None)
+                    for key, value in items.items()
+                )
+            )
+
+    def close(self):
+        self._pool.close()
@@ -0,0 +1,164 @@
+"""Identifier -> location lookup shared by pages/Map.py and the offline bulk geocoder.
+
+The offline geocoder runs without Streamlit, over a process pool; every worker memory-maps
+the same .npy columns (fonctions.postal_columns), so the postal data is loaded once in the
+OS page cache instead of once per process:
+
+    python -m fonctions.geocoder adresses.csv --column code_postal --out resultats/ --workers 8
+"""
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+from fonctions.bulk_geocode import BulkResultWriter, geocode_csv_parallel
+from fonctions.csv_utils import detect_encoding, sniff_dialect
+from fonctions.postal_columns import CSV_FILE_PATH, COLUMNS_DIR_PATH, columns_are_current, convert_csv_to_columns, load_columns
+from fonctions.postal_index import PostalIndex, PARTIAL_POSTAL_CODE_PATTERN, POSTAL_CODE_PATTERN
+
+# Score minimal (coefficient de Dice des trigrammes) pour accepter un nom de ville approximatif
+FUZZY_CITY_MIN_SCORE = 0.5
+
+# Index du processus courant (workers du géocodage hors ligne)
+_worker_index = None
+
+
+def is_valid_postal_code(code):
+    if not code:
+        return False
+    return bool(POSTAL_CODE_PATTERN.match(code.upper()))
+
+
+def get_coordinates_from_data(identifier, postal_index):
+    identifier = identifier.strip()
+
+    # Try coordinates format first
+    if ',' in identifier:
+        try:
+            lat_str, lon_str = map(str.strip, identifier.split(','))
+            lat, lon = float(lat_str), float(lon_str)
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                address = f"Coordonnées: {lat}, {lon}"
+                # Géocodage inverse: code postal le plus proche (index spatial)
+                nearest = postal_index.nearest_postal_codes(lat, lon)
+                if nearest:
+                    record, distance = nearest[0]
+                    address += f"<br>Près de: {record.postal_code[:3]} {record.postal_code[3:]}, {record.city}, {record.province} ({distance:.1f} km)"
+                return {
+                    'lat': lat,
+                    'lon': lon,
+                    'type': 'coordinates',
+                    'address': address
+                }
+        except ValueError:
+            pass  # Not valid coordinates, continue with other checks
+    
+    # Clean postal code
+    cleaned_identifier = identifier.upper().replace(' ', '')
+    
+    # Try postal code
+    if is_valid_postal_code(cleaned_identifier):
+        location = postal_index.get_postal_code(cleaned_identifier)
+        if location:
+            return {
+                'lat': location.lat,
+                'lon': location.lon,
+                'type': 'postal_code',
+                'address': f"{location.city}, {location.province}"
+            }
+    
+    # Try FSA or partial postal code (G0J, G0J 1, G0J 1J): centroid of the matching codes
+    if PARTIAL_POSTAL_CODE_PATTERN.match(cleaned_identifier):
+        summary = postal_index.prefix_summary(cleaned_identifier)
+        if summary:
+            examples = ', '.join(record.postal_code for record in postal_index.match_prefix(cleaned_identifier, limit=5))
+            return {
+                'lat': summary.lat,
+                'lon': summary.lon,
+                'type': 'fsa',
+                'address': f"{summary.count} codes postaux ({examples}{', ...' if summary.count > 5 else ''})"
+            }
+
+    # Try city
+    city = postal_index.get_city(identifier)
+    if city:
+        name, province, lat, lon = city
+        return {
+            'lat': lat,
+            'lon': lon,
+            'type': 'city',
+            'address': f"{name}, {province}"
+        }
+
+    # Try city with typos (Rimousky, Quebec City): closest name by trigrams
+    matches = postal_index.search_city(identifier, limit=1, min_score=FUZZY_CITY_MIN_SCORE)
+    if matches:
+        (name, province, lat, lon), score = matches[0]
+        return {
+            'lat': lat,
+            'lon': lon,
+            'type': 'city',
+            'address': f"{name}, {province} (correspondance approximative: {score:.0%})"
+        }
+    
+    return None
+
+
+def _init_worker(columns_dir):
+    # Colonnes mappées en mémoire, grille spatiale et index des trigrammes compris: rien n'est reconstruit ici
+    global _worker_index
+    _worker_index = PostalIndex(load_columns(columns_dir))
+
+
+def _geocode_values(values):
+    return [get_coordinates_from_data(value, _worker_index) if value else None for value in values]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Géocodage d'un fichier CSV hors ligne, sur plusieurs processus.")
+    parser.add_argument('input', type=Path, help="fichier CSV à géocoder")
+    parser.add_argument('--column', required=True, help="colonne contenant les codes postaux, villes ou coordonnées")
+    parser.add_argument('--out', type=Path, help="dossier de sortie (défaut: <fichier>_geocodage)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--postal-csv', type=Path, default=CSV_FILE_PATH)
+    parser.add_argument('--columns-dir', type=Path, default=COLUMNS_DIR_PATH)
+    args = parser.parse_args(argv)
+    out_dir = args.out or args.input.with_name(f'{args.input.stem}_geocodage')
+
+    # Conversion faite une seule fois ici, avant de lancer les workers
+    if not columns_are_current(args.postal_csv, args.columns_dir):
+        convert_csv_to_columns(args.postal_csv, args.columns_dir)
+
+    # Même détection d'encodage que la page Map (UTF-8, sinon Windows-1252)
+    with open(args.input, 'rb') as f:
+        encoding = detect_encoding(f.read(64 * 1024))
+
+    rows_done, seconds = 0, 0.0
+    try:
+        with open(args.input, encoding=encoding, newline='') as f:
+            sample = f.read(64 * 1024)
+            dialect = sniff_dialect(sample)
+            f.seek(0)
+            header = next(csv.reader(f, dialect), [])
+            if args.column not in header:
+                parser.error(f"colonne {args.column!r} absente de l'en-tête: {header}")
+            f.seek(0)
+
+            with BulkResultWriter(out_dir, header) as writer:
+                chunks = geocode_csv_parallel(
+                    f, args.column, _geocode_values, writer, args.workers, args.chunk_size, dialect,
+                    initializer=_init_worker, initargs=(args.columns_dir,)
+                )
+                for rows_done, _, seconds in chunks:
+                    print(f"{rows_done} lignes, {rows_done / max(seconds, 1e-9):.0f} lignes/s", file=sys.stderr)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Les lignes déjà traitées restent dans les fichiers de résultats
+        parser.error(f"lecture de {args.input} interrompue après {rows_done} lignes ({encoding}): {e}")
+
+    print(f"{writer.resolved} lignes géocodées, {writer.rejected} rejetées en {seconds:.1f} s -> {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
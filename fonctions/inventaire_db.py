@@ -0,0 +1,265 @@
+"""Accès à la base de l'inventaire (pages/Inventaire.py).
+
+Une seule connexion SQLite par processus, partagée par toutes les sessions (st.cache_resource):
+mode WAL (les lectures ne bloquent pas l'écriture), busy_timeout pour attendre un verrou au
+lieu d'échouer avec "database is locked", et schéma créé une seule fois à l'ouverture.
+Les requêtes sont des constantes, donc réutilisées depuis le cache d'instructions préparées
+de la connexion.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_FILE_PATH = Path('data/inventaire.db')
+EMPLACEMENTS = ["Ch 2003", "Ancienne Buanderie", "Buanderie", "Cuisine", "Salle de pause", "Vestiaire"]
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS inventaire (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        product_number TEXT,
+        number_of_boxes INTEGER NOT NULL,
+        quantity_in_box INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        stored_emplacement TEXT NOT NULL,
+        row_version INTEGER NOT NULL DEFAULT 0
+    )
+'''
+
+# Compteur de modifications: chaque ligne ajoutée, modifiée ou supprimée l'incrémente (triggers,
+# donc aussi pour les écritures faites hors de l'application) et la ligne garde la valeur reçue.
+# Le compteur sert de clé au cache des pages, row_version à détecter les modifications concurrentes.
+# PRAGMA data_version ne suffit pas: il ignore les écritures faites par la même connexion.
+VERSIONING = (
+    '''
+    CREATE TABLE IF NOT EXISTS inventaire_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    'INSERT OR IGNORE INTO inventaire_version VALUES (1, 0)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventaire_after_insert AFTER INSERT ON inventaire BEGIN
+        UPDATE inventaire_version SET version = version + 1;
+        UPDATE inventaire SET row_version = (SELECT version FROM inventaire_version) WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventaire_after_update
+    AFTER UPDATE OF id, name, product_number, number_of_boxes, quantity_in_box, total_quantity, stored_emplacement
+    ON inventaire BEGIN
+        UPDATE inventaire_version SET version = version + 1;
+        UPDATE inventaire SET row_version = (SELECT version FROM inventaire_version) WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventaire_after_delete AFTER DELETE ON inventaire BEGIN
+        UPDATE inventaire_version SET version = version + 1;
+    END
+    ''',
+)
+
+# Filtres de la pagination: emplacement exact, début du nom ou du numéro de produit (sans casse)
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_inventaire_emplacement ON inventaire(stored_emplacement, id)',
+    'CREATE INDEX IF NOT EXISTS idx_inventaire_name ON inventaire(name COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS idx_inventaire_product_number ON inventaire(product_number COLLATE NOCASE)',
+)
+
+COLUMNS = [
+    'id', 'name', 'product_number', 'number_of_boxes', 'quantity_in_box', 'total_quantity',
+    'stored_emplacement', 'row_version'
+]
+
+SELECT_PAGE_QUERY = f"SELECT {', '.join(COLUMNS)} FROM inventaire {{}} ORDER BY id {{}} LIMIT ?"
+COUNT_QUERY = 'SELECT COUNT(*) FROM inventaire {}'
+VERSION_QUERY = 'SELECT version FROM inventaire_version'
+INSERT_QUERY = '''
+    INSERT INTO inventaire
+    (id, name, product_number, number_of_boxes, quantity_in_box, total_quantity, stored_emplacement)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# Import en lot: ajout, ou mise à jour complète si l'ID existe déjà
+UPSERT_QUERY = '''
+    INSERT INTO inventaire
+    (id, name, product_number, number_of_boxes, quantity_in_box, total_quantity, stored_emplacement)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name,
+        product_number = excluded.product_number,
+        number_of_boxes = excluded.number_of_boxes,
+        quantity_in_box = excluded.quantity_in_box,
+        total_quantity = excluded.total_quantity,
+        stored_emplacement = excluded.stored_emplacement
+'''
+EXISTING_IDS_QUERY = 'SELECT id FROM inventaire WHERE id IN (SELECT value FROM json_each(?))'
+# Colonnes modifiables depuis la grille (l'ID et le total ne le sont pas)
+EDITABLE_COLUMNS = ('name', 'product_number', 'number_of_boxes', 'quantity_in_box', 'stored_emplacement')
+
+
+def update_statement(values):
+    """UPDATE conditionnel (id et row_version lus) ne modifiant que les colonnes de values.
+
+    Le total est recalculé en SQL à partir des nouvelles quantités, ou des anciennes si
+    seule l'une des deux change.
+    """
+    unknown = set(values) - set(EDITABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Colonnes non modifiables: {', '.join(sorted(unknown))}")
+    assignments = [f'{column} = :{column}' for column in EDITABLE_COLUMNS if column in values]
+    if 'number_of_boxes' in values or 'quantity_in_box' in values:
+        assignments.append(
+            'total_quantity = COALESCE(:number_of_boxes, number_of_boxes) * COALESCE(:quantity_in_box, quantity_in_box)'
+        )
+    return f"UPDATE inventaire SET {', '.join(assignments)} WHERE id = :id AND row_version = :row_version"
+
+
+def like_prefix(text):
+    """Motif LIKE "commence par text", caractères spéciaux échappés."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def filter_conditions(emplacement=None, name=None, product_number=None):
+    """(conditions, paramètres) SQL des filtres renseignés."""
+    conditions, params = [], []
+    if emplacement:
+        conditions.append('stored_emplacement = ?')
+        params.append(emplacement)
+    if name:
+        conditions.append("name LIKE ? ESCAPE '\\'")
+        params.append(like_prefix(name))
+    if product_number:
+        conditions.append("product_number LIKE ? ESCAPE '\\'")
+        params.append(like_prefix(product_number))
+    return conditions, params
+
+
+def where_clause(conditions):
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+
+class InventaireDB:
+    """Connexion partagée à la base de l'inventaire; un verrou sérialise les accès entre sessions."""
+
+    def __init__(self, db_path=DB_FILE_PATH, busy_timeout_ms=5000, cache_size_kib=8 * 1024):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # isolation_level=None: pas de transaction implicite, les écritures ouvrent BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            self.db_path,
+            timeout=busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64,
+        )
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+        self._conn.execute(f'PRAGMA cache_size = -{int(cache_size_kib)}')
+        self._conn.execute('PRAGMA temp_store = MEMORY')
+        with self.transaction() as cursor:
+            cursor.execute(SCHEMA)
+            # Base créée avant le suivi des versions
+            if 'row_version' not in [row[1] for row in cursor.execute('PRAGMA table_info(inventaire)')]:
+                cursor.execute('ALTER TABLE inventaire ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0')
+            for statement in (*VERSIONING, *INDEXES):
+                cursor.execute(statement)
+            # Sans statistiques, le planificateur préfère parcourir la clé primaire même pour un filtre très sélectif
+            if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+                cursor.execute('ANALYZE')
+
+    @contextmanager
+    def transaction(self):
+        """Curseur dans une transaction d'écriture: COMMIT en sortie, ROLLBACK si exception."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+
+    def version(self):
+        """Compteur de modifications de la table (augmente à chaque ligne ajoutée, modifiée ou supprimée)."""
+        with self._lock:
+            return self._conn.execute(VERSION_QUERY).fetchone()[0]
+
+    def fetch_page(self, after_id=None, limit=50, descending=False, emplacement=None, name=None, product_number=None):
+        """(lignes, encore) d'une page triée par id, à partir de l'id after_id exclu (pagination par clé).
+
+        Seules limit lignes sont lues; encore indique s'il reste des lignes après la page.
+        """
+        conditions, params = filter_conditions(emplacement, name, product_number)
+        if after_id is not None:
+            conditions.append('id < ?' if descending else 'id > ?')
+            params.append(after_id)
+        query = SELECT_PAGE_QUERY.format(where_clause(conditions), 'DESC' if descending else 'ASC')
+        with self._lock:
+            rows = self._conn.execute(query, [*params, limit + 1]).fetchall()
+        return rows[:limit], len(rows) > limit
+
+    def count(self, emplacement=None, name=None, product_number=None):
+        """Nombre de lignes correspondant aux filtres."""
+        conditions, params = filter_conditions(emplacement, name, product_number)
+        with self._lock:
+            return self._conn.execute(COUNT_QUERY.format(where_clause(conditions)), params).fetchone()[0]
+
+    def insert_item(self, id, name, product_number, number_of_boxes, quantity_in_box, stored_emplacement):
+        """Ajoute un article; sqlite3.IntegrityError si l'ID existe déjà."""
+        with self.transaction() as cursor:
+            cursor.execute(INSERT_QUERY, (
+                id, name, product_number, number_of_boxes, quantity_in_box,
+                number_of_boxes * quantity_in_box, stored_emplacement
+            ))
+
+    def upsert_items(self, rows):
+        """Ajoute ou remplace des lignes (id, name, product_number, number_of_boxes, quantity_in_box,
+        total_quantity, stored_emplacement) en une transaction; un id None crée un nouvel article.
+
+        Retourne (ajoutées, mises à jour).
+        """
+        with self.transaction() as cursor:
+            ids = [row[0] for row in rows if row[0] is not None]
+            existing = {row[0] for row in cursor.execute(EXISTING_IDS_QUERY, (json.dumps(ids),))}
+            inserted = 0
+            for id, *_ in rows:
+                if id is None or id not in existing:
+                    inserted += 1
+                    existing.add(id)
+            cursor.executemany(UPSERT_QUERY, rows)
+        return inserted, len(rows) - inserted
+
+    def update_items(self, changes):
+        """Applique en une transaction les modifications {id: (row_version, {colonne: valeur})}.
+
+        Une ligne n'est modifiée que si sa row_version est celle lue avant la modification;
+        sinon (modifiée ou supprimée entre-temps) elle est laissée telle quelle.
+        Retourne (nombre de lignes modifiées, IDs en conflit).
+        """
+        updated, conflicts = 0, []
+        with self.transaction() as cursor:
+            for id, (row_version, values) in changes.items():
+                if not values:
+                    continue
+                params = {'number_of_boxes': None, 'quantity_in_box': None, **values, 'id': id, 'row_version': row_version}
+                cursor.execute(update_statement(values), params)
+                if cursor.rowcount:
+                    updated += 1
+                else:
+                    conflicts.append(id)
+        return updated, conflicts
+
+    def optimize(self):
+        """Met à jour les statistiques du planificateur si nécessaire (après un import)."""
+        with self._lock:
+            self._conn.execute('PRAGMA optimize')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
@@ -0,0 +1,195 @@
+"""Import en lot de l'inventaire depuis un fichier CSV ou XLSX (pages/Inventaire.py).
+
+Le fichier est lu ligne par ligne: chaque ligne est validée et complétée (total_quantity)
+au passage, puis les lignes valides sont écrites par lots avec executemany, un lot par
+transaction, pour ne pas bloquer les autres utilisateurs pendant tout l'import.
+"""
+import csv
+import io
+import time
+import unicodedata
+from itertools import islice
+
+from fonctions.csv_utils import sniff_dialect
+from fonctions.inventaire_db import EMPLACEMENTS
+
+IMPORT_CHUNK_SIZE = 5000
+# Lignes rejetées conservées pour l'affichage et le téléchargement (toutes sont comptées)
+MAX_REJECTED_KEPT = 1000
+
+FIELDS = ['id', 'name', 'product_number', 'number_of_boxes', 'quantity_in_box', 'stored_emplacement']
+REQUIRED_FIELDS = ['name', 'number_of_boxes', 'quantity_in_box', 'stored_emplacement']
+
+# En-têtes acceptés: noms des colonnes de la table ou libellés du formulaire, sans accents ni casse
+HEADER_ALIASES = {
+    'id': 'id',
+    'name': 'name',
+    'nom': 'name',
+    'product_number': 'product_number',
+    'numero de produit': 'product_number',
+    'number_of_boxes': 'number_of_boxes',
+    'nombre de boites': 'number_of_boxes',
+    'quantity_in_box': 'quantity_in_box',
+    'quantite par boite': 'quantity_in_box',
+    'stored_emplacement': 'stored_emplacement',
+    'emplacement': 'stored_emplacement',
+}
+
+
+def fold_header(text):
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(text.lower().split())
+
+
+_EMPLACEMENTS = {fold_header(emplacement): emplacement for emplacement in EMPLACEMENTS}
+
+
+def map_header(header):
+    """Champ (FIELDS) de chaque colonne du fichier, None pour les colonnes ignorées.
+
+    ValueError si une colonne obligatoire manque.
+    """
+    fields = [HEADER_ALIASES.get(fold_header(column)) for column in header]
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"Colonnes obligatoires absentes: {', '.join(missing)}")
+    return fields
+
+
+def iter_csv_rows(binary_file):
+    """Lignes (listes de valeurs) d'un CSV, en-tête compris; séparateur détecté."""
+    stream = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    dialect = sniff_dialect(stream.read(64 * 1024))
+    stream.seek(0)
+    yield from csv.reader(stream, dialect)
+
+
+def iter_xlsx_rows(binary_file):
+    """Lignes de la première feuille d'un classeur XLSX, lues en mode streaming (openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("L'import de fichiers XLSX nécessite openpyxl (pip install openpyxl)")
+    workbook = load_workbook(binary_file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def open_rows(binary_file, filename):
+    """(champs de l'en-tête, lignes suivantes) d'un fichier CSV ou XLSX.
+
+    Seul l'en-tête est lu: les erreurs de format ou de colonnes sont levées ici, avant toute écriture.
+    """
+    rows = iter_xlsx_rows(binary_file) if filename.lower().endswith('.xlsx') else iter_csv_rows(binary_file)
+    return map_header(next(rows, [])), rows
+
+
+def parse_count(value):
+    """Entier >= 0 à partir d'un texte ou d'une cellule (12, '12', 12.0); ValueError sinon."""
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError
+        value = int(value)
+    elif not isinstance(value, int):
+        text = str(value).strip().replace(' ', '')
+        number = float(text)
+        if not number.is_integer():
+            raise ValueError
+        value = int(number)
+    if value < 0:
+        raise ValueError
+    return value
+
+
+def cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def validate_row(record):
+    """(ligne prête pour InventaireDB.upsert_items, None) ou (None, raison du rejet)."""
+    name = cell_text(record.get('name'))
+    if not name:
+        return None, "nom manquant"
+    try:
+        number_of_boxes = parse_count(record.get('number_of_boxes'))
+        quantity_in_box = parse_count(record.get('quantity_in_box'))
+    except (TypeError, ValueError):
+        return None, "quantité invalide (entier positif attendu)"
+    emplacement = _EMPLACEMENTS.get(fold_header(record.get('stored_emplacement')))
+    if emplacement is None:
+        return None, f"emplacement inconnu: {cell_text(record.get('stored_emplacement'))}"
+    id = cell_text(record.get('id'))
+    if not id:
+        id = None  # nouvel article, ID attribué par la base
+    else:
+        try:
+            id = parse_count(id)
+        except ValueError:
+            return None, "ID invalide"
+    return (
+        id,
+        name,
+        cell_text(record.get('product_number')) or None,
+        number_of_boxes,
+        quantity_in_box,
+        number_of_boxes * quantity_in_box,
+        emplacement,
+    ), None
+
+
+class ImportReport:
+    """Compteurs d'un import et premières lignes rejetées (numéro de ligne, raison, valeurs)."""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.rejected_rows = []
+        self.seconds = 0.0
+        # Erreur ayant interrompu l'import; les lots précédents restent écrits
+        self.error = None
+
+    def reject(self, line, reason, values):
+        self.rejected += 1
+        if len(self.rejected_rows) < MAX_REJECTED_KEPT:
+            self.rejected_rows.append({'ligne': line, 'raison': reason, 'valeurs': ' | '.join(map(cell_text, values))})
+
+
+def import_rows(db, fields, rows, report, chunk_size=IMPORT_CHUNK_SIZE):
+    """Valide et écrit rows (lignes de données, fields venant de open_rows) dans db, lot par lot.
+
+    Met à jour report et le renvoie après chaque lot, pour afficher la progression.
+    """
+    start = time.perf_counter()
+    numbered = enumerate(rows, start=2)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        for line, values in chunk:
+            if not any(cell_text(value) for value in values):
+                continue  # ligne vide
+            record = {field: value for field, value in zip(fields, values) if field}
+            row, reason = validate_row(record)
+            if row is None:
+                report.reject(line, reason, values)
+            else:
+                valid.append(row)
+            report.rows += 1
+        if valid:
+            inserted, updated = db.upsert_items(valid)
+            report.inserted += inserted
+            report.updated += updated
+        report.seconds = time.perf_counter() - start
+        yield report
+    db.optimize()
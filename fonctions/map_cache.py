@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+import folium
+
+from fonctions.postal_index import normalize_location_line
+
+CachedMap = namedtuple('CachedMap', ['html', 'payload'])
+
+
+def map_cache_key(locations, **options):
+    """Stable hash of the normalized location list and the rendering options.
+
+    Case is kept: the cached HTML shows each line as typed, so "MONTREAL" and "montreal"
+    are different maps.
+    """
+    data = json.dumps(
+        {'locations': [normalize_location_line(line) for line in locations], 'options': options},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:20]
+
+
+def render_map_html(m):
+    """HTML of a folium map, as rendered by streamlit_folium.folium_static."""
+    return folium.Figure().add_child(m).render()
+
+
+class RenderedMapCache:
+    """Rendered map HTML keyed by map_cache_key, with LRU eviction by entry count and total size.
+
+    Meant to be shared by every session (st.cache_resource), hence the lock.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=200 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """CachedMap for key (marked as most recently used) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, html, payload=None):
+        """Store html (and an optional payload) under key and return the new CachedMap."""
+        entry = CachedMap(html, payload)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key).html)
+            self._entries[key] = entry
+            self._bytes += len(html)
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.html)
+        return entry
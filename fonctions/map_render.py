@@ -0,0 +1,217 @@
+import branca.colormap
+import folium
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+from folium.plugins import FastMarkerCluster, HeatMap
+
+# Au-delà de ce nombre de points, les marqueurs sont générés côté navigateur et regroupés
+CLUSTER_THRESHOLD = 500
+
+MARKER_COLORS = {'coordinates': 'green', 'postal_code': 'red', 'city': 'blue', 'fsa': 'orange'}
+DEFAULT_MARKER_COLOR = 'blue'
+
+# Agrégation: regroupement par RTA quand elle est connue, sinon par cellule de grille
+AGGREGATE_CELL_DEG = 0.25
+FSA_LOCATION_TYPES = ('postal_code', 'fsa')
+
+# Rangées compactes [lat, lon, indice de couleur, popup] -> marqueur Leaflet avec la même icône que folium.Icon
+_CLUSTER_CALLBACK = """
+function (row) {
+    var colors = %s;
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: colors[row[2]], prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[3]);
+    return marker;
+}
+"""
+
+
+def marker_color(location_type):
+    return MARKER_COLORS.get(location_type, DEFAULT_MARKER_COLOR)
+
+
+def add_location_markers(m, points, threshold=CLUSTER_THRESHOLD):
+    """Add (lat, lon, location_type, popup_html) points to the map.
+
+    Up to threshold points, one folium.Marker each (unchanged look). Above it, the points
+    are sent once as a compact array to a FastMarkerCluster, which builds and clusters
+    the markers in the browser, so the page no longer carries one Python-side object
+    and HTML/JS block per point.
+    """
+    if len(points) <= threshold:
+        for lat, lon, location_type, popup in points:
+            folium.Marker(
+                [lat, lon],
+                popup=popup,
+                icon=folium.Icon(color=marker_color(location_type), icon='info-sign')
+            ).add_to(m)
+        return m
+
+    colors = list(dict.fromkeys([*MARKER_COLORS.values(), DEFAULT_MARKER_COLOR]))
+    data = [
+        [round(lat, 6), round(lon, 6), colors.index(marker_color(location_type)), popup]
+        for lat, lon, location_type, popup in points
+    ]
+    FastMarkerCluster(data, callback=_CLUSTER_CALLBACK % colors).add_to(m)
+    return m
+
+
+def fsa_key(identifier, location_type):
+    """FSA (first 3 characters) of a postal code or partial code identifier, None for other types."""
+    if location_type not in FSA_LOCATION_TYPES:
+        return None
+    return identifier.upper().replace(' ', '')[:3]
+
+
+def aggregate_points(lat, lon, keys=None, cell_deg=AGGREGATE_CELL_DEG):
+    """Group points by key (e.g. FSA) or, where the key is None, by lat/lon grid cell.
+
+    Returns (labels, centroid_lat, centroid_lon, counts), one entry per group; grouping,
+    counts and centroids are computed with np.unique/np.bincount, without a Python loop
+    over the points.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    keys = np.array([None] * len(lat) if keys is None else keys, dtype=object)
+    keyed = np.not_equal(keys, None)
+
+    labels, inverses = [], []
+    offset = 0
+    if keyed.any():
+        fsa_labels, inverse = np.unique(keys[keyed].astype(str), return_inverse=True)
+        labels.extend(fsa_labels.tolist())
+        inverses.append((keyed, inverse))
+        offset = len(fsa_labels)
+    if (~keyed).any():
+        rows = np.floor((lat[~keyed] + 90) / cell_deg).astype(np.int64)
+        cols = np.floor((lon[~keyed] + 180) / cell_deg).astype(np.int64)
+        n_cols = int(360 / cell_deg) + 1
+        cells, inverse = np.unique(rows * n_cols + cols, return_inverse=True)
+        # Libellé d'une cellule: son coin sud-ouest
+        labels.extend(
+            f"{row * cell_deg - 90:.2f}, {col * cell_deg - 180:.2f}"
+            for row, col in zip((cells // n_cols).tolist(), (cells % n_cols).tolist())
+        )
+        inverses.append((~keyed, inverse + offset))
+
+    group = np.empty(len(lat), dtype=np.int64)
+    for mask, inverse in inverses:
+        group[mask] = inverse
+    counts = np.bincount(group, minlength=len(labels))
+    centroid_lat = np.bincount(group, weights=lat, minlength=len(labels)) / np.maximum(counts, 1)
+    centroid_lon = np.bincount(group, weights=lon, minlength=len(labels)) / np.maximum(counts, 1)
+    return labels, centroid_lat, centroid_lon, counts
+
+
+def add_aggregated_layer(m, points, keys=None, cell_deg=AGGREGATE_CELL_DEG):
+    """Add (lat, lon, location_type, popup_html) points to the map as one circle per group.
+
+    Circles are sized and coloured by count; a heatmap of the same groups is available
+    from the layer control. The browser receives one feature per group, not per point.
+    """
+    if not points:
+        return m
+    lat = [point[0] for point in points]
+    lon = [point[1] for point in points]
+    labels, centroid_lat, centroid_lon, counts = aggregate_points(lat, lon, keys, cell_deg)
+
+    max_count = int(counts.max())
+    colormap = branca.colormap.LinearColormap(
+        ['#ffffb2', '#fd8d3c', '#bd0026'], vmin=1, vmax=max(max_count, 2), caption='Nombre de points'
+    )
+    circles = folium.FeatureGroup(name='Cercles')
+    for label, group_lat, group_lon, count in zip(labels, centroid_lat, centroid_lon, counts.tolist()):
+        folium.CircleMarker(
+            [group_lat, group_lon],
+            radius=5 + 20 * np.sqrt(count / max_count),
+            color=colormap(count),
+            fill=True,
+            fill_opacity=0.7,
+            weight=1,
+            tooltip=f"{label}: {count}",
+        ).add_to(circles)
+    circles.add_to(m)
+
+    heat = folium.FeatureGroup(name='Carte de chaleur', show=False)
+    HeatMap(np.column_stack([centroid_lat, centroid_lon, counts / max_count]).tolist()).add_to(heat)
+    heat.add_to(m)
+
+    colormap.add_to(m)
+    folium.LayerControl().add_to(m)
+    return m
+
+
+def add_route_line(m, points, route):
+    """Draw route (fonctions.route.Route over (lat, lon, ...) points) as a polyline, with start and end markers."""
+    if len(route.order) < 2:
+        return m
+    path = [[points[i][0], points[i][1]] for i in route.order.tolist()]
+    folium.PolyLine(path, color='#3388ff', weight=3, opacity=0.8, tooltip=f"Itinéraire: {route.total_km:.1f} km").add_to(m)
+    folium.CircleMarker(path[0], radius=7, color='green', fill=True, fill_opacity=1, tooltip='Départ').add_to(m)
+    folium.CircleMarker(path[-1], radius=7, color='black', fill=True, fill_opacity=1, tooltip='Arrivée').add_to(m)
+    return m
+
+
+class GeoJsonMarkers(MacroElement):
+    """All points as one GeoJSON FeatureCollection, drawn as circle markers.
+
+    Colour comes from a single JS style function keyed on the feature's type, and popups
+    are built from the feature properties only when a marker is clicked.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }}_colors = {{ this.colors|tojson }};
+        var {{ this.get_name() }}_labels = {{ this.labels|tojson }};
+        function {{ this.get_name() }}_escape(text) {
+            var div = document.createElement('div');
+            div.textContent = text;
+            return div.innerHTML;
+        }
+        var {{ this.get_name() }} = L.geoJson({{ this.data|tojson }}, {
+            pointToLayer: function (feature, latlng) {
+                var color = {{ this.get_name() }}_colors[feature.properties.type] || {{ this.default_color|tojson }};
+                return L.circleMarker(latlng, {radius: 6, color: color, fillColor: color, fillOpacity: 0.8, weight: 1});
+            },
+            onEachFeature: function (feature, layer) {
+                layer.bindPopup(function () {
+                    var p = feature.properties;
+                    return ({{ this.get_name() }}_labels[p.type] || {{ this.default_label|tojson }}) + ': '
+                        + {{ this.get_name() }}_escape(p.name) + '<br>' + {{ this.address_label|tojson }} + ': ' + p.address;
+                });
+            }
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, labels, default_label, address_label):
+        super().__init__()
+        self._name = 'GeoJsonMarkers'
+        self.data = data
+        self.colors = MARKER_COLORS
+        self.default_color = DEFAULT_MARKER_COLOR
+        self.labels = labels
+        self.default_label = default_label
+        self.address_label = address_label
+
+
+def add_geojson_markers(m, features, labels, default_label='Ville', address_label='Adresse'):
+    """Add (lat, lon, location_type, name, address) features to the map as one GeoJSON layer.
+
+    The page carries one compact feature per point and no per-marker icon or popup HTML;
+    labels maps location types to the popup prefix.
+    """
+    data = {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+                'properties': {'type': location_type, 'name': name, 'address': address},
+            }
+            for lat, lon, location_type, name, address in features
+        ],
+    }
+    GeoJsonMarkers(data, labels, default_label, address_label).add_to(m)
+    return m
@@ -0,0 +1,136 @@
+"""Columnar (numpy .npy) copy of the postal code CSV.
+
+Only the columns used by the Map page are kept: postal code as fixed-width bytes
+(sorted), latitude/longitude as float64, city and province as small integer ids into
+name tables, plus the precomputed city index, spatial grid and city-name trigram
+index. Arrays are memory-mapped read-only, so loading is near instant, nothing is
+rebuilt per process and the pages are shared between processes.
+
+    python -m fonctions.postal_columns data/CanadianPostalCodes202403.csv data/postal_codes_columns
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from fonctions.city_search import TrigramIndex
+from fonctions.postal_index import build_city_index, csv_signature, normalize_postal_code
+from fonctions.spatial_index import GridIndex
+
+CSV_FILE_PATH = Path('data/CanadianPostalCodes202403.csv')
+COLUMNS_DIR_PATH = Path('data/postal_codes_columns')
+SOURCE_FILE = 'source.json'
+
+PostalColumns = namedtuple('PostalColumns', [
+    'postal_code', 'latitude', 'longitude', 'city_id', 'province_id',
+    'city_names', 'province_names', 'city_index',
+    'grid_order', 'grid_cell_ids',
+    'trigram_sizes', 'trigram_grams', 'trigram_offsets', 'trigram_ids',
+])
+
+
+def convert_csv_to_columns(csv_path, out_dir=COLUMNS_DIR_PATH):
+    """One-time conversion of the postal code CSV to .npy columns in out_dir."""
+    codes, latitudes, longitudes, city_ids, province_ids = [], [], [], [], []
+    city_names, province_names = {}, {}
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            codes.append(normalize_postal_code(row['POSTAL_CODE']))
+            latitudes.append(float(row['LATITUDE']))
+            longitudes.append(float(row['LONGITUDE']))
+            city_ids.append(city_names.setdefault(row['CITY'], len(city_names)))
+            province_ids.append(province_names.setdefault(row['PROVINCE_ABBR'], len(province_names)))
+
+    city_names = list(city_names)
+    province_names = list(province_names)
+
+    # Tri stable par code postal: recherche binaire possible et, à code égal, l'ordre du CSV est conservé
+    postal_code = np.array(codes, dtype='S6')
+    order = np.argsort(postal_code, kind='stable')
+    columns = {
+        'postal_code': postal_code[order],
+        'latitude': np.array(latitudes, dtype=np.float64)[order],
+        'longitude': np.array(longitudes, dtype=np.float64)[order],
+        'city_id': np.array(city_ids, dtype=np.uint32)[order],
+        'province_id': np.array(province_ids, dtype=np.uint8)[order],
+        'city_names': np.array(city_names, dtype=str),
+        'province_names': np.array(province_names, dtype=str),
+    }
+
+    cities = build_city_index(
+        (city_names[c], province_names[p], lat, lon)
+        for c, p, lat, lon in zip(city_ids, province_ids, latitudes, longitudes)
+    )
+    keys = sorted(cities)
+    city_index = np.zeros(len(keys), dtype=[
+        ('key', 'U%d' % max(map(len, keys), default=1)),
+        ('city', 'U%d' % max(map(len, city_names), default=1)),
+        ('province', 'U%d' % max(map(len, province_names), default=1)),
+        ('lat', 'f8'),
+        ('lon', 'f8'),
+    ])
+    for i, key in enumerate(keys):
+        city_index[i] = (key, *cities[key])
+    columns['city_index'] = city_index
+
+    # Index construits ici une fois pour toutes, relus tels quels par fonctions.postal_index
+    grid = GridIndex(columns['latitude'], columns['longitude'])
+    columns.update((f'grid_{name}', array) for name, array in grid.arrays().items())
+    city_search = TrigramIndex(city_index['key'])
+    columns.update((f'trigram_{name}', array) for name, array in city_search.arrays().items())
+
+    # Écrit dans un dossier temporaire puis mis en place par renommage: les fichiers d'une
+    # conversion précédente, peut-être encore mappés en mémoire par un index, ne sont jamais
+    # réécrits (les tronquer ferait planter ce processus avec un Bus error)
+    out_dir = Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = out_dir.with_name(f'{out_dir.name}.tmp-{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+    for name, array in columns.items():
+        np.save(tmp_dir / f'{name}.npy', array)
+    mtime_ns, size = csv_signature(csv_path)
+    # Écrit en dernier: un dossier sans source.json est une conversion incomplète
+    (tmp_dir / SOURCE_FILE).write_text(json.dumps({'csv_mtime_ns': mtime_ns, 'csv_size': size}))
+
+    # Un dossier non vide ne peut pas être remplacé directement: l'ancien est d'abord écarté.
+    # Ses fichiers supprimés restent lisibles par les mappings existants jusqu'à leur fermeture
+    old_dir = out_dir.with_name(f'{out_dir.name}.old-{os.getpid()}')
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def columns_are_current(csv_path, columns_dir=COLUMNS_DIR_PATH):
+    """True if columns_dir holds a complete conversion of the current csv_path."""
+    columns_dir = Path(columns_dir)
+    try:
+        source = json.loads((columns_dir / SOURCE_FILE).read_text())
+    except (OSError, ValueError):
+        return False
+    # Une conversion d'une version précédente peut ne pas avoir toutes les colonnes
+    if not all((columns_dir / f'{name}.npy').exists() for name in PostalColumns._fields):
+        return False
+    return (source['csv_mtime_ns'], source['csv_size']) == csv_signature(csv_path)
+
+
+def load_columns(columns_dir=COLUMNS_DIR_PATH):
+    """Memory-map the converted columns read-only."""
+    columns_dir = Path(columns_dir)
+    return PostalColumns(*(
+        np.load(columns_dir / f'{name}.npy', mmap_mode='r') for name in PostalColumns._fields
+    ))
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else CSV_FILE_PATH
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else COLUMNS_DIR_PATH
+    convert_csv_to_columns(csv_path, out_dir)
+    print(f"Colonnes écrites dans {out_dir}")
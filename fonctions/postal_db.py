@@ -0,0 +1,101 @@
+"""Builds data/postal_codes.db (used by pages/Map_test_sql.py) from the postal code CSV.
+
+Keys are normalized at import time, so lookups are plain equality probes on the
+clustered primary keys instead of REPLACE()/UPPER() expressions that force a scan:
+
+    python -m fonctions.postal_db data/CanadianPostalCodes202403.csv data/postal_codes.db
+"""
+import csv
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from fonctions.postal_columns import CSV_FILE_PATH
+from fonctions.postal_index import build_city_index, csv_signature, fold_city_name, normalize_postal_code
+
+DB_FILE_PATH = Path('data/postal_codes.db')
+
+SCHEMA = '''
+    CREATE TABLE postal_codes (
+        postal_key TEXT PRIMARY KEY,
+        postal_code TEXT NOT NULL,
+        city TEXT NOT NULL,
+        province_abbr TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        city_key TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_city_key ON postal_codes(city_key);
+    CREATE INDEX idx_geolocation ON postal_codes(latitude, longitude);
+
+    CREATE TABLE cities (
+        city_key TEXT PRIMARY KEY,
+        city TEXT NOT NULL,
+        province_abbr TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID;
+'''
+
+# Requêtes de recherche par lot: {} reçoit la liste de paramètres '?, ?, ...' des clés;
+# une sonde B-tree par clé (vérifié au démarrage par EXPLAIN QUERY PLAN)
+POSTAL_CODE_BATCH_QUERY = '''
+    SELECT postal_key, city, province_abbr, latitude, longitude FROM postal_codes WHERE postal_key IN ({})
+'''
+CITY_BATCH_QUERY = '''
+    SELECT city_key, city, province_abbr, latitude, longitude FROM cities WHERE city_key IN ({})
+'''
+
+
+def build_postal_database(csv_path, db_path=DB_FILE_PATH):
+    """Import the CSV into a fresh database at db_path (written to a temp file, then swapped in)."""
+    db_path = Path(db_path)
+    tmp_path = db_path.with_suffix('.db.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    rows = []
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            rows.append((
+                normalize_postal_code(row['POSTAL_CODE']),
+                row['POSTAL_CODE'],
+                row['CITY'],
+                row['PROVINCE_ABBR'],
+                float(row['LATITUDE']),
+                float(row['LONGITUDE']),
+                fold_city_name(row['CITY']),
+            ))
+    cities = build_city_index((r[2], r[3], r[4], r[5]) for r in rows)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            # Insertion triée par clé: pages B-tree remplies séquentiellement. Doublons: le premier gagne
+            rows.sort(key=lambda r: r[0])
+            conn.executemany('INSERT OR IGNORE INTO postal_codes VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.executemany(
+                'INSERT INTO cities VALUES (?, ?, ?, ?, ?)',
+                ((key, *city) for key, city in sorted(cities.items()))
+            )
+            mtime_ns, size = csv_signature(csv_path)
+            conn.execute('INSERT INTO meta VALUES (?, ?)', ('dataset_version', f'{mtime_ns}-{size}'))
+        conn.execute('ANALYZE')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else CSV_FILE_PATH
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DB_FILE_PATH
+    count = build_postal_database(csv_path, db_path)
+    print(f"{count} codes postaux importés dans {db_path}")
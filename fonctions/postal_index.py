@@ -0,0 +1,184 @@
+import re
+import unicodedata
+from collections import Counter, namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from fonctions.city_search import TrigramIndex
+from fonctions.spatial_index import GridIndex
+
+# Abréviations ramenées à leur forme longue avant comparaison
+CITY_WORD_ALIASES = {'st': 'saint', 'ste': 'sainte'}
+
+PostalRecord = namedtuple('PostalRecord', ['postal_code', 'city', 'province', 'lat', 'lon'])
+PrefixSummary = namedtuple('PrefixSummary', ['prefix', 'count', 'lat', 'lon'])
+
+POSTAL_CODE_PATTERN = re.compile(r'^[A-Z]\d[A-Z]\s?\d[A-Z]\d$')
+# Début de code postal: RTA (G0J) éventuellement suivie de 1 ou 2 caractères de l'unité de distribution
+PARTIAL_POSTAL_CODE_PATTERN = re.compile(r'^[A-Z]\d[A-Z](\d[A-Z]?)?$')
+
+
+def normalize_postal_code(code):
+    """Return the postal code in upper case without spaces (g0j 1j0 -> G0J1J0)."""
+    return code.upper().replace(' ', '')
+
+
+def normalize_location_line(line):
+    """One input line trimmed, inner whitespace collapsed; case and accents are kept."""
+    return ' '.join(line.split())
+
+
+def fold_city_name(name):
+    """Comparison key for a city name: lower case, no accents, hyphens and St/Ste expanded.
+
+    "Montréal", "MONTREAL" and "montreal" share a key, as do "St-Jean" and "Saint Jean".
+    """
+    text = unicodedata.normalize('NFKD', name)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"['’]", '', text)
+    text = re.sub(r'[-.,/]', ' ', text)
+    return ' '.join(CITY_WORD_ALIASES.get(word, word) for word in text.split())
+
+
+def build_city_index(rows):
+    """Map folded city name -> (city, province, lat, lon) from (city, province, lat, lon) rows.
+
+    When a name exists in several provinces the one with the most postal codes wins,
+    and the coordinate is the mean of that city's postal codes.
+    """
+    groups = {}
+    for city, province, lat, lon in rows:
+        group = groups.setdefault(fold_city_name(city), {}).setdefault(province, [0, 0.0, 0.0, Counter()])
+        group[0] += 1
+        group[1] += lat
+        group[2] += lon
+        group[3][city] += 1
+
+    index = {}
+    for key, provinces in groups.items():
+        province, (count, lat_sum, lon_sum, names) = max(provinces.items(), key=lambda item: item[1][0])
+        index[key] = (names.most_common(1)[0][0], province, lat_sum / count, lon_sum / count)
+    return index
+
+
+def csv_signature(csv_path):
+    """(mtime, size) of the CSV, used as cache key so the index is rebuilt when the file changes."""
+    stat = Path(csv_path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PostalIndex:
+    """Read-only postal code lookups over the columnar store (see fonctions.postal_columns).
+
+    Instances are meant to be shared between sessions (st.cache_resource). The columns are
+    read-only memory maps; exact code, prefix and city lookups are binary searches over them,
+    and the spatial grid and trigram index are reopened from the arrays saved with them, so
+    building an index costs nothing per process.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        # Clés triées à l'écriture (postal_columns): recherche dichotomique sans dictionnaire
+        self._city_keys = columns.city_index['key']
+        self.spatial = GridIndex(
+            columns.latitude, columns.longitude, order=columns.grid_order, cell_ids=columns.grid_cell_ids
+        )
+        self.city_search = TrigramIndex(
+            self._city_keys, sizes=columns.trigram_sizes, grams=columns.trigram_grams,
+            offsets=columns.trigram_offsets, ids=columns.trigram_ids,
+        )
+
+    def __len__(self):
+        return len(self.columns.postal_code)
+
+    def resident_size(self):
+        """Approximate memory held by the index, in bytes (the grid and trigram index are columns too)."""
+        return sum(array.nbytes for array in self.columns)
+
+    def record(self, i):
+        """PostalRecord for row i of the sorted columns."""
+        c = self.columns
+        return PostalRecord(
+            c.postal_code[i].decode('ascii'),
+            str(c.city_names[c.city_id[i]]),
+            str(c.province_names[c.province_id[i]]),
+            float(c.latitude[i]),
+            float(c.longitude[i]),
+        )
+
+    def get_postal_code(self, code):
+        """PostalRecord for a postal code (any case/spacing) or None.
+
+        Binary search over the sorted fixed-width code column: ~20 comparisons in C,
+        without a per-code Python dict to build or keep in memory.
+        """
+        try:
+            key = normalize_postal_code(code).encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        codes = self.columns.postal_code
+        i = int(np.searchsorted(codes, key))
+        if i < len(codes) and codes[i] == key:
+            return self.record(i)
+        return None
+
+    def _city_entry(self, key):
+        i = int(np.searchsorted(self._city_keys, key))
+        if i < len(self._city_keys) and self._city_keys[i] == key:
+            row = self.columns.city_index[i]
+            return str(row['city']), str(row['province']), float(row['lat']), float(row['lon'])
+        return None
+
+    def get_city(self, name):
+        """(city, province, lat, lon) for a city name, accent and case insensitive, or None."""
+        return self._city_entry(fold_city_name(name))
+
+    def search_city(self, name, limit=5, min_score=0.0):
+        """Closest city names to name, typo tolerant: list of ((city, province, lat, lon), score), best first."""
+        return [
+            (self._city_entry(match.key), match.score)
+            for match in self.city_search.search(fold_city_name(name), limit, min_score)
+        ]
+
+    def nearest_postal_codes(self, lat, lon, k=1):
+        """[(PostalRecord, distance_km)] of the k postal codes closest to (lat, lon)."""
+        ids, distances = self.spatial.nearest(lat, lon, k)
+        return [(self.record(i), float(d)) for i, d in zip(ids, distances)]
+
+    def postal_codes_within(self, lat, lon, radius_km, limit=None):
+        """[(PostalRecord, distance_km)] within radius_km of (lat, lon), closest first, and the total count."""
+        ids, distances = self.spatial.within_radius(lat, lon, radius_km)
+        return [(self.record(i), float(d)) for i, d in zip(ids[:limit], distances[:limit])], len(ids)
+
+    def prefix_range(self, prefix):
+        """(start, end) rows of the sorted code column starting with prefix (binary search, no scan)."""
+        try:
+            key = normalize_postal_code(prefix).encode('ascii')
+        except UnicodeEncodeError:
+            return 0, 0
+        codes = self.columns.postal_code
+        # b'\xff' trie après tout caractère de code postal: borne haute de la plage du préfixe
+        return int(np.searchsorted(codes, key, side='left')), int(np.searchsorted(codes, key + b'\xff', side='left'))
+
+    def prefix_summary(self, prefix):
+        """PrefixSummary (count and centroid) of the codes starting with prefix, or None if there are none.
+
+        With a 3-character FSA (G0J) this is the FSA centroid and member count.
+        """
+        start, end = self.prefix_range(prefix)
+        if start == end:
+            return None
+        return PrefixSummary(
+            normalize_postal_code(prefix),
+            end - start,
+            float(self.columns.latitude[start:end].mean()),
+            float(self.columns.longitude[start:end].mean()),
+        )
+
+    def match_prefix(self, prefix, limit=None):
+        """PostalRecords starting with prefix (at most limit), in code order."""
+        start, end = self.prefix_range(prefix)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self.record(i) for i in range(start, end)]
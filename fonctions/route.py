@@ -0,0 +1,104 @@
+"""Distances between plotted locations and a visiting order (nearest neighbour + 2-opt)."""
+import csv
+import io
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from fonctions.spatial_index import haversine_km
+
+Route = namedtuple('Route', ['order', 'legs_km', 'total_km'])
+
+
+def distance_matrix(lat, lon):
+    """n x n great-circle distances in km, computed in one broadcast haversine call."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def nearest_neighbour_order(distances, start=0):
+    """Greedy path from start, always moving to the closest unvisited point."""
+    n = len(distances)
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=np.int64)
+    current = start
+    for step in range(n):
+        order[step] = current
+        visited[current] = True
+        if step < n - 1:
+            current = int(np.argmin(np.where(visited, np.inf, distances[current])))
+    return order
+
+
+def two_opt(order, distances, max_seconds=0.5):
+    """Improve an open path (fixed start, free end) by 2-opt segment reversals.
+
+    For each edge, the gain of every possible reversal is computed at once with numpy and
+    the best one is applied; passes repeat until no reversal shortens the path or the
+    time budget is spent.
+    """
+    order = np.array(order, dtype=np.int64)
+    n = len(order)
+    if n < 4:
+        return order
+    deadline = time.perf_counter() + max_seconds
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(n - 2):
+            a, b = order[i], order[i + 1]
+            # Inverser order[i+1..j]: les arêtes (a, b) et (c, suivant) deviennent (a, c) et (b, suivant)
+            c = order[i + 2:]
+            following = order[i + 3:]
+            delta = distances[a, c] - distances[a, b]
+            delta[:-1] += distances[b, following] - distances[c[:-1], following]
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                order[i + 1:i + 3 + j] = order[i + 1:i + 3 + j][::-1]
+                improved = True
+    return order
+
+
+def plan_route(lat, lon, start=0, max_seconds=0.5):
+    """Route through every point starting at start: order, leg lengths and total length in km."""
+    if len(lat) == 0:
+        return Route(np.empty(0, dtype=np.int64), np.empty(0), 0.0)
+    distances = distance_matrix(lat, lon)
+    order = two_opt(nearest_neighbour_order(distances, start), distances, max_seconds)
+    legs_km = distances[order[:-1], order[1:]]
+    return Route(order, legs_km, float(legs_km.sum()))
+
+
+def route_steps(lat, lon, names, labels):
+    """plan_route over the points, plus one dict per stop in visit order for display.
+
+    labels maps 'stop', 'location', 'latitude', 'longitude', 'leg_km' and 'total_km' to the
+    column names shown by the page; names[i] is the location label of point i.
+    """
+    route = plan_route(lat, lon)
+    cumulative = np.cumsum(np.concatenate([[0.0], route.legs_km]))
+    steps = [
+        {
+            labels['stop']: n + 1,
+            labels['location']: names[i],
+            labels['latitude']: lat[i],
+            labels['longitude']: lon[i],
+            labels['leg_km']: round(float(route.legs_km[n - 1]), 2) if n else 0.0,
+            labels['total_km']: round(float(cumulative[n]), 2),
+        }
+        for n, i in enumerate(route.order.tolist())
+    ]
+    return route, steps
+
+
+def distance_matrix_csv(steps, labels):
+    """CSV text of the distance matrix between route_steps stops, rows and columns in visit order."""
+    matrix = distance_matrix([step[labels['latitude']] for step in steps], [step[labels['longitude']] for step in steps])
+    names = [step[labels['location']] for step in steps]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['', *names])
+    writer.writerows([name, *np.round(row, 2).tolist()] for name, row in zip(names, matrix))
+    return output.getvalue()
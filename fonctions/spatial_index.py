@@ -0,0 +1,101 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; numpy broadcasting, so any mix of scalars and arrays works."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GridIndex:
+    """Uniform lat/lon grid over point arrays, for radius and nearest-neighbour queries.
+
+    Point ids are stored sorted by cell, so the points of a run of adjacent cells in one
+    grid row are a single contiguous slice found by binary search. A query only computes
+    distances for the points in the cells overlapping its bounding box. The sorted ids and
+    cells can be saved with arrays() and passed back (same points and cell_deg) to reopen
+    the index without sorting again.
+    """
+
+    def __init__(self, latitude, longitude, cell_deg=0.1, order=None, cell_ids=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.cell_deg = cell_deg
+        self._n_cols = int(np.ceil(360 / cell_deg)) + 1
+        self._n_rows = int(np.ceil(180 / cell_deg)) + 1
+        if order is None:
+            cell_ids = self._cell_row(np.asarray(latitude)) * self._n_cols + self._cell_col(np.asarray(longitude))
+            order = np.argsort(cell_ids, kind='stable').astype(np.int32)
+            cell_ids = cell_ids[order]
+        self._order = order
+        self._cell_ids = cell_ids
+
+    def arrays(self):
+        """{name: array} to save; passed back as keyword arguments, they rebuild the same index."""
+        return {'order': self._order, 'cell_ids': self._cell_ids}
+
+    def __len__(self):
+        return len(self._order)
+
+    @property
+    def nbytes(self):
+        return self._order.nbytes + self._cell_ids.nbytes
+
+    def _cell_row(self, lat):
+        return np.clip(np.floor((lat + 90) / self.cell_deg), 0, self._n_rows - 1).astype(np.int64)
+
+    def _cell_col(self, lon):
+        return np.clip(np.floor((lon + 180) / self.cell_deg), 0, self._n_cols - 1).astype(np.int64)
+
+    def _candidates(self, lat, lon, radius_km):
+        # Ids of the points in the cells covering the bounding box of the circle
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(min(abs(lat) + dlat, 89.9))), 1e-3))
+        if dlon >= 180:
+            lon_min, lon_max = -180, 180
+        else:
+            lon_min, lon_max = lon - dlon, lon + dlon
+        row_min, row_max = self._cell_row(lat - dlat), self._cell_row(lat + dlat)
+        if lon_min < -180:
+            col_ranges = [(self._cell_col(lon_min + 360), self._n_cols - 1), (0, self._cell_col(lon_max))]
+        elif lon_max > 180:
+            col_ranges = [(self._cell_col(lon_min), self._n_cols - 1), (0, self._cell_col(lon_max - 360))]
+        else:
+            col_ranges = [(self._cell_col(lon_min), self._cell_col(lon_max))]
+
+        rows = np.arange(row_min, row_max + 1) * self._n_cols
+        slices = []
+        for col_min, col_max in col_ranges:
+            starts = np.searchsorted(self._cell_ids, rows + col_min, side='left')
+            ends = np.searchsorted(self._cell_ids, rows + col_max, side='right')
+            slices.extend(self._order[start:end] for start, end in zip(starts, ends) if end > start)
+        if not slices:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate(slices)
+
+    def within_radius(self, lat, lon, radius_km):
+        """(ids, distances_km) of every point within radius_km of (lat, lon), closest first."""
+        ids = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.latitude[ids], self.longitude[ids])
+        keep = distances <= radius_km
+        ids, distances = ids[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return ids[order], distances[order]
+
+    def nearest(self, lat, lon, k=1, start_km=5.0):
+        """(ids, distances_km) of the k points closest to (lat, lon).
+
+        The search radius doubles until k points fall inside it; a point at distance d
+        is always inside the box of any radius >= d, so the result is exact.
+        """
+        k = min(k, len(self))
+        radius_km = start_km
+        while True:
+            ids, distances = self.within_radius(lat, lon, radius_km)
+            if len(ids) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return ids[:k], distances[:k]
+            radius_km *= 2
@@ -0,0 +1,69 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """SQLite connections shared by threads: a connection is borrowed for one operation, then reused.
+
+    connect() opens a new connection (check_same_thread=False). With max_size, at most that
+    many are ever opened and callers wait up to timeout seconds for one to be returned;
+    without it the pool only grows to the number of concurrent callers.
+    """
+
+    def __init__(self, connect, max_size=None, timeout=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError('connection pool is closed')
+            can_open = self.max_size is None or self._opened < self.max_size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            # Pool exhausted: wait for a connection to be returned
+            return self._idle.get(timeout=self.timeout)
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def release(self, conn):
+        with self._lock:
+            closed = self._closed
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        # Idle connections are closed now, borrowed ones when they are returned
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
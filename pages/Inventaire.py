@@ -1,56 +1,78 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
 import sqlite3
+from fonctions.inventaire_db import COLUMNS, DB_FILE_PATH, EDITABLE_COLUMNS, EMPLACEMENTS, InventaireDB
+from fonctions.inventaire_import import ImportReport, import_rows, open_rows
+
+PAGE_SIZES = [25, 50, 100, 250]
+MAX_EDIT_ROWS = 500
+
+# Une seule connexion WAL par processus, partagée par toutes les sessions; le schéma est créé à l'ouverture
+@st.cache_resource
+def get_inventaire_db():
+    return InventaireDB(DB_FILE_PATH)
+
+# Une page à la fois: mise en cache par version de la table (compteur de modifications), filtres et position
+@st.cache_data(max_entries=64)
+def load_page(version, after_id, limit, descending, emplacement, name, product_number):
+    rows, has_more = get_inventaire_db().fetch_page(after_id, limit, descending, emplacement, name, product_number)
+    return pd.DataFrame(rows, columns=COLUMNS), has_more
+
+@st.cache_data(max_entries=64)
+def count_items(version, emplacement, name, product_number):
+    return get_inventaire_db().count(emplacement, name, product_number)
+
+def next_page(last_id):
+    st.session_state.inventaire_cursors.append(last_id)
+
+def previous_page():
+    st.session_state.inventaire_cursors.pop()
+
+def show_inventaire_table():
+    col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 1, 1])
+    with col1:
+        emplacement = st.selectbox("Emplacement", ["Tous", *EMPLACEMENTS], key="filtre_emplacement")
+    with col2:
+        name = st.text_input("Nom (début)", key="filtre_nom").strip()
+    with col3:
+        product_number = st.text_input("Numéro de produit (début)", key="filtre_produit").strip()
+    with col4:
+        limit = st.selectbox("Par page", PAGE_SIZES, index=1, key="taille_page")
+    with col5:
+        descending = st.selectbox("Tri", ["ID ↑", "ID ↓"], key="tri") == "ID ↓"
+    emplacement = None if emplacement == "Tous" else emplacement
+
+    # Pagination par clé: id de départ (exclu) de chaque page parcourue, remis à zéro si les filtres changent
+    filters = (emplacement, name, product_number, limit, descending)
+    if st.session_state.get("inventaire_filters") != filters:
+        st.session_state.inventaire_filters = filters
+        st.session_state.inventaire_cursors = [None]
+    cursors = st.session_state.inventaire_cursors
 
-DB_FILE_PATH = Path('data/inventaire.db')
-
-def init_database():
-    # Création du dossier data s'il n'existe pas
-    DB_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    # Création de la table si elle n'existe pas
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS inventaire (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            product_number TEXT,
-            number_of_boxes INTEGER NOT NULL,
-            quantity_in_box INTEGER NOT NULL,
-            total_quantity INTEGER NOT NULL,
-            stored_emplacement TEXT NOT NULL
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-@st.cache_data(ttl=3600)  # Mise à jour de st.cache à st.cache_data
-def load_data():
-    conn = None
     try:
-        conn = sqlite3.connect(DB_FILE_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM inventaire')
-        columns = [description[0] for description in cursor.description]
-        data = cursor.fetchall()
-        
-        return pd.DataFrame(data, columns=columns)
+        version = get_inventaire_db().version()
+        data, has_more = load_page(version, cursors[-1], limit, descending, emplacement, name, product_number)
+        total = count_items(version, emplacement, name, product_number)
     except Exception as e:
         st.error(f"Erreur de lecture de la base de données: {e}")
-        return pd.DataFrame()
-    finally:
-        if conn:
-            conn.close()
+        return
 
-def show_inventaire_form():
-    data = load_data()
-    
     if not data.empty:
-        st.dataframe(data)  
+        st.dataframe(data, hide_index=True, column_config={'row_version': None})
+
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button("◀ Précédent", disabled=len(cursors) == 1, on_click=previous_page, key="page_precedente")
+    with col2:
+        st.caption(f"Page {len(cursors)} / {max(-(-total // limit), 1)}, {total} article(s)")
+    with col3:
+        st.button(
+            "Suivant ▶", disabled=not has_more, key="page_suivante",
+            on_click=next_page, args=(int(data['id'].iloc[-1]) if has_more else None,)
+        )
+
+def show_inventaire_form():
+    show_inventaire_table()
 
     with st.form(key="inventaire_form"):
         id = st.number_input("ID", min_value=0, step=1)
@@ -58,74 +80,173 @@ def show_inventaire_form():
         product_number = st.text_input("Numéro de produit")
         number_of_boxes = st.number_input("Nombre de boîtes", min_value=0, step=1)
         quantity_in_box = st.number_input("Quantité par boîte", min_value=0, step=1)
-        total_quantity = number_of_boxes * quantity_in_box
         stored_emplacement = st.selectbox(
             "Emplacement", 
-            ["Ch 2003", "Ancienne Buanderie", "Buanderie", "Cuisine", "Salle de pause", "Vestiaire"]
+            EMPLACEMENTS
         )
         
         submitted = st.form_submit_button("Ajouter")
         
         if submitted:
-            conn = None
             try:
-                conn = sqlite3.connect(DB_FILE_PATH)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO inventaire 
-                    (id, name, product_number, number_of_boxes, quantity_in_box, total_quantity, stored_emplacement)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (id, name, product_number, number_of_boxes, quantity_in_box, total_quantity, stored_emplacement))
-                conn.commit()
+                get_inventaire_db().insert_item(id, name, product_number, number_of_boxes, quantity_in_box, stored_emplacement)
                 st.success("Données ajoutées avec succès.")
                 st.rerun() 
             except sqlite3.IntegrityError:
                 st.error("Erreur: ID déjà existant.")
             except Exception as e:
                 st.error(f"Erreur lors de l'ajout des données: {e}")
-            finally:
-                if conn:
-                    conn.close()
+
+def load_update_grid(emplacement, name):
+    rows, has_more = get_inventaire_db().fetch_page(None, MAX_EDIT_ROWS, False, emplacement, name)
+    st.session_state.grille_base = pd.DataFrame(rows, columns=COLUMNS)
+    st.session_state.grille_filters = (emplacement, name)
+    st.session_state.grille_tronquee = has_more
+    # Nouvelle clé: l'éditeur repart des données rechargées, sans les modifications précédentes
+    st.session_state.grille_generation = st.session_state.get("grille_generation", 0) + 1
+
+def cell_value(value):
+    # Types numpy et NaN de pandas -> valeurs Python acceptées par sqlite3
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def grid_changes(base, edited):
+    """{id: (row_version, {colonne: nouvelle valeur})} des seules cellules modifiées."""
+    changes = {}
+    for (_, before), (_, after) in zip(base.iterrows(), edited.iterrows()):
+        values = {
+            column: cell_value(after[column]) for column in EDITABLE_COLUMNS
+            if not (pd.isna(before[column]) and pd.isna(after[column])) and before[column] != after[column]
+        }
+        if values:
+            changes[int(before['id'])] = (int(before['row_version']), values)
+    return changes
+
+def invalid_changes(changes):
+    """IDs dont une valeur modifiée est vide alors qu'elle est obligatoire."""
+    return [
+        id for id, (_, values) in changes.items()
+        if any(value is None or value == "" for column, value in values.items() if column != 'product_number')
+    ]
 
 def show_update_form():
+    col1, col2 = st.columns(2)
+    with col1:
+        emplacement = st.selectbox("Emplacement", ["Tous", *EMPLACEMENTS], key="grille_emplacement")
+    with col2:
+        name = st.text_input("Nom (début)", key="grille_nom").strip()
+    emplacement = None if emplacement == "Tous" else emplacement
+
+    # Les lignes sont lues une fois puis éditées telles quelles: leur row_version sert à détecter
+    # les modifications faites par quelqu'un d'autre pendant la saisie
+    reload = st.button("Recharger", key="grille_recharger")
+    try:
+        if reload or st.session_state.get("grille_filters") != (emplacement, name):
+            load_update_grid(emplacement, name)
+    except Exception as e:
+        st.error(f"Erreur de lecture de la base de données: {e}")
+        return
+    base = st.session_state.grille_base
+    if st.session_state.grille_tronquee:
+        st.caption(f"Seuls les {MAX_EDIT_ROWS} premiers articles sont affichés: précisez les filtres.")
+    if base.empty:
+        st.info("Aucun article.")
+        return
+
     with st.form(key="update_form"):
-        id = st.number_input("ID", min_value=0, step=1)
-        number_of_boxes = st.number_input("Nombre de boîtes", min_value=0, step=1)
-        quantity_in_box = st.number_input("Quantité par boîte", min_value=0, step=1)
-        total_quantity = number_of_boxes * quantity_in_box
-        
+        edited = st.data_editor(
+            base, hide_index=True, num_rows="fixed",
+            key=f"grille_{st.session_state.grille_generation}",
+            disabled=['id', 'total_quantity'],
+            column_config={
+                'row_version': None,
+                'name': st.column_config.TextColumn("Nom", required=True),
+                'product_number': st.column_config.TextColumn("Numéro de produit"),
+                'number_of_boxes': st.column_config.NumberColumn("Nombre de boîtes", min_value=0, step=1, required=True),
+                'quantity_in_box': st.column_config.NumberColumn("Quantité par boîte", min_value=0, step=1, required=True),
+                'total_quantity': st.column_config.NumberColumn("Quantité totale"),
+                'stored_emplacement': st.column_config.SelectboxColumn("Emplacement", options=EMPLACEMENTS, required=True),
+            },
+        )
         submitted = st.form_submit_button("Mettre à jour")
-        
-        if submitted:
-            conn = None
+
+    if submitted:
+        changes = grid_changes(base, edited)
+        invalid = invalid_changes(changes)
+        if not changes:
+            st.info("Aucune modification.")
+        elif invalid:
+            st.error(f"Valeurs obligatoires manquantes pour les ID: {', '.join(map(str, invalid))}")
+        else:
             try:
-                conn = sqlite3.connect(DB_FILE_PATH)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE inventaire 
-                    SET number_of_boxes = ?, quantity_in_box = ?, total_quantity = ?
-                    WHERE id = ?
-                ''', (number_of_boxes, quantity_in_box, total_quantity, id))
-                
-                if cursor.rowcount == 0:
-                    st.error("Aucun enregistrement trouvé avec cet ID.")
-                else:
-                    conn.commit()
-                    st.success("Données mises à jour avec succès.")
-                    st.rerun()
+                updated, conflicts = get_inventaire_db().update_items(changes)
             except Exception as e:
                 st.error(f"Erreur lors de la mise à jour des données: {e}")
-            finally:
-                if conn:
-                    conn.close()
+                return
+            st.session_state.grille_resultat = (updated, conflicts)
+            load_update_grid(emplacement, name)
+            st.rerun()
+
+    if "grille_resultat" in st.session_state:
+        updated, conflicts = st.session_state.pop("grille_resultat")
+        st.success(f"{updated} article(s) mis à jour.")
+        if conflicts:
+            st.warning(
+                "Modifiés ou supprimés par quelqu'un d'autre pendant la saisie, non enregistrés "
+                f"(valeurs actuelles affichées): ID {', '.join(map(str, conflicts))}"
+            )
+
+def show_import_form():
+    st.caption(
+        "Colonnes: ID (facultatif, remplace l'article existant), Nom, Numéro de produit, "
+        "Nombre de boîtes, Quantité par boîte, Emplacement"
+    )
+    uploaded = st.file_uploader("Fichier CSV ou Excel (.xlsx)", type=["csv", "xlsx"], key="import_file")
+    if uploaded is not None and st.button("Importer", key="importer"):
+        st.session_state.pop("import_report", None)
+        try:
+            fields, rows = open_rows(uploaded, uploaded.name)
+        except Exception as e:
+            # En-tête ou format invalide: rien n'a été écrit
+            st.error(f"Fichier refusé: {e}")
+            return
+        progress = st.empty()
+        report = ImportReport()
+        try:
+            for report in import_rows(get_inventaire_db(), fields, rows, report):
+                progress.caption(f"{report.rows} lignes lues ({report.rows / max(report.seconds, 1e-9):.0f} lignes/s)")
+        except Exception as e:
+            report.error = str(e)
+        st.session_state.import_report = report
+
+    report = st.session_state.get("import_report")
+    if report:
+        summary = (
+            f"{report.inserted} article(s) ajouté(s), {report.updated} mis à jour, "
+            f"{report.rejected} ligne(s) rejetée(s) ({report.seconds:.1f} s)"
+        )
+        if report.error:
+            st.error(
+                f"Import interrompu après {report.rows} lignes: {report.error}. "
+                f"Les lignes déjà importées sont conservées: {summary}"
+            )
+        else:
+            st.success(summary)
+        if report.rejected_rows:
+            with st.expander("Lignes rejetées"):
+                rejected = pd.DataFrame(report.rejected_rows)
+                st.dataframe(rejected, hide_index=True)
+                st.download_button("Télécharger (CSV)", rejected.to_csv(index=False), "rejets.csv", "text/csv")
 
 def main():
-    init_database()
-    tab_1, tab_2 = st.tabs(["Inventaire", "Mise à jour"])
+    tab_1, tab_2, tab_3 = st.tabs(["Inventaire", "Mise à jour", "Import"])
     with tab_1:
         show_inventaire_form()
     with tab_2:
         show_update_form()
+    with tab_3:
+        show_import_form()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,87 +1,267 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import folium
-from streamlit_folium import folium_static
-import re
-from pathlib import Path
+import html
+import io
 import csv
+import time
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+from fonctions.postal_index import PostalIndex, csv_signature
+from fonctions.geocoder import get_coordinates_from_data
+from fonctions.map_render import add_aggregated_layer, add_geojson_markers, add_location_markers, add_route_line, fsa_key
+from fonctions.route import distance_matrix_csv, route_steps
+from fonctions.map_cache import RenderedMapCache, map_cache_key, render_map_html
+from fonctions.bulk_geocode import BulkResultWriter, geocode_csv_stream
+from fonctions.csv_utils import detect_encoding, sniff_dialect
+from fonctions.postal_columns import CSV_FILE_PATH, COLUMNS_DIR_PATH, columns_are_current, convert_csv_to_columns, load_columns
 
-POSTAL_CODE_PATTERN = r'^[A-Z]\d[A-Z]\s?\d[A-Z]\d$'
-CSV_FILE_PATH = Path('data/CanadianPostalCodes202403.csv')
 INITIAL_LOCATION = [48.45207841277754, -68.52372144956752]
+MAP_WIDTH, MAP_HEIGHT = 1000, 500
+BULK_CHUNK_SIZE = 5000
+LOCATION_LABELS = {'postal_code': 'Code postal', 'fsa': 'RTA / code partiel'}
+DISPLAY_MODES = {'Marqueurs': None, 'Points (GeoJSON)': 'geojson', 'Agrégé par RTA': 'fsa', 'Agrégé par grille': 'grid'}
+MAX_MATRIX_DOWNLOAD = 500
+ROUTE_LABELS = {
+    'stop': 'Ordre',
+    'location': 'Localisation',
+    'latitude': 'Latitude',
+    'longitude': 'Longitude',
+    'leg_km': 'Étape (km)',
+    'total_km': 'Cumul (km)',
+}
+
+# Une seule instance en lecture seule partagée par toutes les sessions (pas de copie à chaque rerun).
+# La signature (mtime, taille) du CSV fait partie de la clé: l'index est reconstruit si le fichier change,
+# et celui de l'ancienne version est libéré
+@st.cache_resource(max_entries=1)
+def load_postal_index(signature):
+    # Conversion en colonnes .npy une seule fois par version du CSV, ensuite simple mmap
+    if not columns_are_current(CSV_FILE_PATH, COLUMNS_DIR_PATH):
+        convert_csv_to_columns(CSV_FILE_PATH, COLUMNS_DIR_PATH)
+    return PostalIndex(load_columns(COLUMNS_DIR_PATH))
 
-@st.cache_data(ttl=3600)
-def load_postal_codes():
+def get_postal_index():
     try:
-        with open(CSV_FILE_PATH, 'r', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
+        return load_postal_index(csv_signature(CSV_FILE_PATH))
     except Exception as e:
         st.error(f"Erreur de lecture du fichier CSV: {e}")
-        return []
+        return None
 
-def is_valid_postal_code(code):
-    if not code:
-        return False
-    return bool(re.match(POSTAL_CODE_PATTERN, code.upper()))
+# Cartes déjà rendues, partagées entre sessions: même liste (normalisée) = ni géocodage ni rendu
+@st.cache_resource
+def get_map_cache():
+    return RenderedMapCache()
 
-def get_coordinates_from_data(identifier, postal_codes_data):
-    identifier = identifier.strip()
+def show_map_html(map_html):
+    components.html(map_html, height=MAP_HEIGHT + 10, width=MAP_WIDTH)
 
-    # Try coordinates format first
-    if ',' in identifier:
-        try:
-            lat_str, lon_str = map(str.strip, identifier.split(','))
-            lat, lon = float(lat_str), float(lon_str)
-            if -90 <= lat <= 90 and -180 <= lon <= 180:
-                return {
-                    'lat': lat,
-                    'lon': lon,
-                    'type': 'coordinates',
-                    'address': f"Coordonnées: {lat}, {lon}"
-                }
-        except ValueError:
-            pass  # Not valid coordinates, continue with other checks
-    
-    # Clean postal code
-    cleaned_identifier = identifier.upper().replace(' ', '')
-    
-    # Try postal code
-    if is_valid_postal_code(cleaned_identifier):
-        for location in postal_codes_data:
-            if location['POSTAL_CODE'].replace(' ', '') == cleaned_identifier:
-                return {
-                    'lat': float(location['LATITUDE']),
-                    'lon': float(location['LONGITUDE']),
-                    'type': 'postal_code',
-                    'address': f"{location['CITY']}, {location['PROVINCE_ABBR']}"
-                }
-    
-    # Try city
-    for location in postal_codes_data:
-        if location['CITY'].upper() == identifier.upper():
-            return {
-                'lat': float(location['LATITUDE']),
-                'lon': float(location['LONGITUDE']),
-                'type': 'city',
-                'address': f"{location['CITY']}, {location['PROVINCE_ABBR']}"
-            }
-    
-    return None
+def location_marker(identifier, location):
+    # (lat, lon, type, popup) du marqueur; la saisie est échappée, la carte rendue étant partagée (?carte=)
+    return (
+        location['lat'],
+        location['lon'],
+        location['type'],
+        f"{LOCATION_LABELS.get(location['type'], 'Ville')}: {html.escape(identifier)}<br>Adresse: {location['address']}"
+    )
 
-def create_map(locations_data, postal_codes_data):
+def resolve_locations(locations, postal_index, dataset):
+    """Localisations des lignes, en ne géocodant que les lignes ajoutées ou modifiées depuis le dernier affichage.
+
+    Les résultats précédents sont gardés dans st.session_state (par session), et oubliés
+    si le fichier de codes postaux a changé.
+    """
+    if st.session_state.get("resolved_dataset") != dataset:
+        st.session_state.resolved_dataset = dataset
+        st.session_state.resolved_locations = {}
+    resolved = st.session_state.resolved_locations
+
+    # Lignes retirées de la liste: on oublie leur résultat
+    current = set(locations)
+    for identifier in [identifier for identifier in resolved if identifier not in current]:
+        del resolved[identifier]
+
+    new_locations = [identifier for identifier in dict.fromkeys(locations) if identifier not in resolved]
+    for identifier in new_locations:
+        resolved[identifier] = get_coordinates_from_data(identifier, postal_index)
+
+    return [resolved[identifier] for identifier in locations], len(new_locations)
+
+def plan_visit_order(found, locations):
+    # Itinéraire sur les points trouvés, en partant du premier de la liste
+    resolved = [(location, identifier) for location, identifier in zip(found, locations) if location]
+    return route_steps(
+        [location['lat'] for location, _ in resolved],
+        [location['lon'] for location, _ in resolved],
+        [identifier for _, identifier in resolved],
+        ROUTE_LABELS,
+    )
+
+def create_map(found, locations, display_mode=None, route=None):
     m = folium.Map(location=INITIAL_LOCATION, zoom_start=7)
-    
-    for identifier in locations_data:
-        location = get_coordinates_from_data(identifier, postal_codes_data)
-        if location:
-            folium.Marker(
-                [location['lat'], location['lon']],
-                popup=f"{'Code postal' if location['type'] == 'postal_code' else 'Ville'}: {identifier}<br>Adresse: {location['address']}",
-                #icon=folium.Icon(color='red' if location['type'] == 'postal_code' else 'blue', icon='info-sign')
-                icon=folium.Icon(color='green' if location['type'] == 'coordinates' else 'red' if location['type'] == 'postal_code' else 'blue', icon='info-sign')
-            ).add_to(m)
-    
+    resolved = [(location, identifier) for location, identifier in zip(found, locations) if location]
+    if display_mode == 'geojson':
+        # Une seule FeatureCollection, popups construites dans le navigateur à partir des propriétés
+        features = [
+            (location['lat'], location['lon'], location['type'], identifier, location['address'])
+            for location, identifier in resolved
+        ]
+        add_geojson_markers(m, features, LOCATION_LABELS)
+    elif display_mode:
+        # Un cercle par RTA (ou cellule de grille) au lieu d'un marqueur par point
+        points = [location_marker(identifier, location) for location, identifier in resolved]
+        keys = [fsa_key(identifier, location['type']) for location, identifier in resolved] if display_mode == 'fsa' else None
+        add_aggregated_layer(m, points, keys)
+    else:
+        # Au-delà du seuil, regroupement des marqueurs côté navigateur
+        add_location_markers(m, [location_marker(identifier, location) for location, identifier in resolved])
+    if route is not None:
+        add_route_line(m, [(location['lat'], location['lon']) for location, _ in resolved], route)
     return m
 
+def show_route(steps):
+    if not steps:
+        return
+    st.markdown(f"**Itinéraire: {steps[-1][ROUTE_LABELS['total_km']]:.1f} km, {len(steps)} arrêts** (distances à vol d'oiseau)")
+    with st.expander("Ordre de visite"):
+        st.dataframe(steps, hide_index=True)
+        if len(steps) <= MAX_MATRIX_DOWNLOAD:
+            # Matrice des distances, lignes et colonnes dans l'ordre de visite
+            st.download_button("Matrice des distances (CSV)", distance_matrix_csv(steps, ROUTE_LABELS), "distances.csv", "text/csv")
+
+def show_radius_search(postal_index):
+    with st.expander("Recherche par rayon"):
+        with st.form("radius_search"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                lat = st.number_input("Latitude", min_value=-90.0, max_value=90.0, value=INITIAL_LOCATION[0], format="%.6f")
+            with col2:
+                lon = st.number_input("Longitude", min_value=-180.0, max_value=180.0, value=INITIAL_LOCATION[1], format="%.6f")
+            with col3:
+                radius_km = st.number_input("Rayon (km)", min_value=0.1, max_value=500.0, value=5.0, step=0.5)
+            submitted = st.form_submit_button("Rechercher")
+
+        if submitted:
+            start = time.perf_counter()
+            matches, total = postal_index.postal_codes_within(lat, lon, radius_km, limit=1000)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            st.caption(f"{total} codes postaux à moins de {radius_km} km ({elapsed_ms:.1f} ms)")
+            if matches:
+                st.dataframe(
+                    [
+                        {'Code postal': r.postal_code, 'Ville': r.city, 'Province': r.province, 'Distance (km)': round(d, 2)}
+                        for r, d in matches
+                    ],
+                    hide_index=True
+                )
+
+def show_city_search(postal_index):
+    with st.expander("Recherche approximative de ville"):
+        name = st.text_input("Nom de ville (fautes de frappe tolérées)", key="city_search")
+        if name:
+            start = time.perf_counter()
+            matches = postal_index.search_city(name, limit=10)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            st.caption(f"{len(matches)} candidat(s) parmi {len(postal_index.city_search)} villes ({elapsed_ms:.2f} ms)")
+            if matches:
+                st.dataframe(
+                    [
+                        {'Ville': city, 'Province': province, 'Score': round(score, 2), 'Latitude': lat, 'Longitude': lon}
+                        for (city, province, lat, lon), score in matches
+                    ],
+                    hide_index=True
+                )
+
+class BulkOutputDir:
+    """Dossier temporaire des résultats de géocodage d'une session.
+
+    Supprimé quand la session (et donc cet objet) disparaît, ou à l'arrêt du serveur.
+    """
+
+    def __init__(self):
+        self.path = Path(tempfile.mkdtemp(prefix="polytools_geocodage_"))
+        weakref.finalize(self, shutil.rmtree, self.path, True)
+
+def bulk_output_dir():
+    if "bulk_output_dir" not in st.session_state:
+        st.session_state.bulk_output_dir = BulkOutputDir()
+    return st.session_state.bulk_output_dir.path
+
+def show_bulk_geocoding(postal_index):
+    with st.expander("Géocodage d'un fichier CSV"):
+        uploaded = st.file_uploader("Fichier CSV (codes postaux, villes ou coordonnées)", type=["csv"], key="bulk_file")
+        if uploaded is None:
+            return
+
+        # Seul l'en-tête est lu ici; le fichier est ensuite parcouru par lots, avec le même encodage
+        raw_sample = uploaded.read(64 * 1024)
+        uploaded.seek(0)
+        encoding = detect_encoding(raw_sample)
+        sample = raw_sample.decode(encoding, errors="ignore")
+        dialect = sniff_dialect(sample)
+        header = next(csv.reader(io.StringIO(sample), dialect), [])
+        if not header:
+            st.error("Le fichier est vide.")
+            return
+        column = st.selectbox("Colonne à géocoder", header)
+
+        if st.button("Géocoder le fichier"):
+            # Résultats écrits dans le dossier de la session (le nouveau travail remplace les fichiers
+            # du précédent): seuls le chemin et les compteurs restent en session
+            st.session_state.pop("bulk_results", None)
+            out_dir = bulk_output_dir()
+
+            progress_bar = st.progress(0.0)
+            status = st.empty()
+            stream = io.TextIOWrapper(uploaded, encoding=encoding, newline="")
+            start = time.perf_counter()
+            error = None
+            with BulkResultWriter(out_dir, header) as writer:
+                chunks = geocode_csv_stream(
+                    stream, column, lambda value: get_coordinates_from_data(value, postal_index),
+                    writer, BULK_CHUNK_SIZE, dialect
+                )
+                try:
+                    for rows_done, chunk_rows, seconds in chunks:
+                        progress_bar.progress(min(uploaded.tell() / max(uploaded.size, 1), 1.0))
+                        status.caption(f"{rows_done} lignes traitées, dernier lot: {chunk_rows / max(seconds, 1e-9):.0f} lignes/s")
+                except (UnicodeDecodeError, csv.Error) as e:
+                    # Les lignes déjà traitées restent dans les fichiers de résultats
+                    error = str(e)
+            progress_bar.progress(1.0)
+            st.session_state.bulk_results = {
+                "dir": out_dir,
+                "resolved": writer.resolved,
+                "rejected": writer.rejected,
+                "seconds": time.perf_counter() - start,
+                "error": error,
+            }
+
+        results = st.session_state.get("bulk_results")
+        if results and Path(results["dir"]).exists():
+            summary = (
+                f"{results['resolved']} lignes géocodées, {results['rejected']} rejetées "
+                f"({results['seconds']:.1f} s)"
+            )
+            if results["error"]:
+                st.error(
+                    f"Lecture du fichier interrompue après {results['resolved'] + results['rejected']} lignes: "
+                    f"{results['error']}. Les résultats couvrent les lignes déjà traitées: {summary}"
+                )
+            else:
+                st.success(summary)
+            out_dir = Path(results["dir"])
+            # Fichiers lus seulement au clic
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.download_button("Résultats (CSV)", (out_dir / "results.csv").read_bytes, "resultats.csv", "text/csv")
+            with col2:
+                st.download_button("Résultats (GeoJSON)", (out_dir / "results.geojson").read_bytes, "resultats.geojson", "application/geo+json")
+            with col3:
+                st.download_button("Lignes rejetées (CSV)", (out_dir / "rejected.csv").read_bytes, "rejets.csv", "text/csv")
+
 def main():
     if "text_content" not in st.session_state:
         st.session_state.text_content = ""
@@ -92,12 +272,13 @@ def main():
     ### Instructions:
     - Entrez des codes postaux, des noms de villes ou des coordonnées (un par ligne)
     - Format de code postal accepté: G0J 1J0,  G0J1J0, g0j 1j0, g0j1j0
-    - Format de ville accepté: Nom de la ville (ex: Montréal, Quebec)
+    - Code partiel accepté: G0J (RTA), G0J 1, G0J 1J (centre des codes correspondants)
+    - Format de ville accepté: Nom de la ville (ex: Montréal, Quebec); les fautes de frappe sont tolérées (Rimousky)
     - Format de coordonnées accepté: Latitude, Longitude (ex: 46.8139, -71.2080 ou 48.45207841277754, -68.52372144956752) ..
     """)
 
-    postal_codes_data = load_postal_codes()
-    if not postal_codes_data:
+    postal_index = get_postal_index()
+    if not postal_index:
         return
 
     if st.button("Effacer", type="primary"):
@@ -112,6 +293,10 @@ def main():
         key="locations"
     )
 
+    display_mode = DISPLAY_MODES[st.radio("Affichage", list(DISPLAY_MODES), horizontal=True)]
+    with_route = st.checkbox("Ordre de visite (itinéraire)")
+    map_cache = get_map_cache()
+
     if st.button("Afficher la carte", type="secondary"):
         locations = [loc.strip() for loc in locations_input.split('\n') if loc.strip()]
         
@@ -120,14 +305,38 @@ def main():
             return
 
         try:
-            with st.spinner("Création de la carte..."):
-                m = create_map(locations, postal_codes_data)
-                folium_static(m, width=1000, height=500)
-                st.caption('data source: https://codes-postaux.cybo.com/ ')
-                st.success(f"{len(locations)} localisations recherchées.")
+            dataset = csv_signature(CSV_FILE_PATH)
+            key = map_cache_key(locations, width=MAP_WIDTH, height=MAP_HEIGHT, dataset=dataset, display=display_mode, route=with_route)
+            cached = map_cache.get(key)
+            if cached is None:
+                with st.spinner("Création de la carte..."):
+                    found, geocoded = resolve_locations(locations, postal_index, dataset)
+                    route, steps = plan_visit_order(found, locations) if with_route else (None, [])
+                    map_html = render_map_html(create_map(found, locations, display_mode, route))
+                cached = map_cache.put(key, map_html, {'count': len(locations), 'route': steps})
+                st.caption(f"{geocoded} ligne(s) géocodée(s), {len(locations) - geocoded} reprise(s) de l'affichage précédent.")
+            show_map_html(cached.html)
+            show_route(cached.payload['route'])
+            # Lien partageable: ?carte=<clé> réaffiche la carte depuis le cache
+            st.query_params["carte"] = key
+            st.caption('data source: https://codes-postaux.cybo.com/ ')
+            st.success(f"{len(locations)} localisations recherchées.")
+            st.caption(f"Index partagé: {len(postal_index)} codes postaux, {postal_index.resident_size() / 1024 ** 2:.0f} Mo en mémoire")
         except Exception as e:
             st.error(f"Erreur lors de la création de la carte: {e}")
-    
+    elif "carte" in st.query_params:
+        cached = map_cache.get(st.query_params["carte"])
+        if cached:
+            show_map_html(cached.html)
+            show_route(cached.payload['route'])
+            st.caption('data source: https://codes-postaux.cybo.com/ ')
+            st.success(f"Carte partagée: {cached.payload['count']} localisations.")
+        else:
+            st.info("Cette carte n'est plus en cache, entrez la liste à nouveau pour la recréer.")
+
+    show_bulk_geocoding(postal_index)
+    show_radius_search(postal_index)
+    show_city_search(postal_index)
 
 
 if __name__ == "__main__":
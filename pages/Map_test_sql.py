@@ -1,23 +1,49 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import folium
-from streamlit_folium import folium_static
+import html
 import re
 from pathlib import Path
 import sqlite3
-from concurrent.futures import ThreadPoolExecutor
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 import logging
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator, Callable
 from dataclasses import dataclass
+from fonctions.postal_index import fold_city_name, normalize_postal_code
+from fonctions.map_render import add_aggregated_layer, add_geojson_markers, add_location_markers, add_route_line, fsa_key
+from fonctions.route import Route, distance_matrix_csv, route_steps
+from fonctions.map_cache import RenderedMapCache, map_cache_key, render_map_html
+from fonctions.geocode_cache import GeocodeCache, normalize_cache_key
+from fonctions.sqlite_pool import ConnectionPool
+from fonctions.postal_db import POSTAL_CODE_BATCH_QUERY, CITY_BATCH_QUERY
 
 # Configuration
 @dataclass
 class Config:
     POSTAL_CODE_PATTERN: str = r'^[A-Z]\d[A-Z]\s?\d[A-Z]\d$'
     DB_FILE_PATH: Path = Path('data/postal_codes.db')
+    GEOCODE_CACHE_PATH: Path = Path('data/geocode_cache.db')
+    GEOCODE_CACHE_SIZE: int = 10000
     INITIAL_LOCATION: Tuple[float, float] = (48.45207841277754, -68.52372144956752)
-    BATCH_SIZE: int = 25
+    MAP_WIDTH: int = 800
+    MAP_HEIGHT: int = 600
+    BATCH_SIZE: int = 500
+    STREAM_BATCH_SIZE: int = 100
     MAX_WORKERS: int = 4
+    DISPLAY_MODES = {'Markers': None, 'Points (GeoJSON)': 'geojson', 'Aggregated by FSA': 'fsa', 'Aggregated by grid': 'grid'}
+    MAX_MATRIX_DOWNLOAD: int = 500
+    LOCATION_LABELS = {'postal_code': 'Postal Code'}
+    ROUTE_LABELS = {
+        'stop': 'Stop',
+        'location': 'Location',
+        'latitude': 'Latitude',
+        'longitude': 'Longitude',
+        'leg_km': 'Leg (km)',
+        'total_km': 'Total (km)',
+    }
+    MMAP_SIZE: int = 256 * 1024 * 1024
+    CACHE_SIZE_KIB: int = 64 * 1024
 
 # Logging setup
 logging.basicConfig(
@@ -27,13 +53,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, pool_size: int = Config.MAX_WORKERS + 1):
         self.db_path = db_path
+        # Read-only connections; at most pool_size are ever opened (geocoding workers + page thread)
+        self._pool = ConnectionPool(self._connect_readonly, pool_size)
+        self._schema_ok = False
         sqlite3.register_adapter(bool, int)
         sqlite3.register_converter("BOOLEAN", lambda v: bool(int(v)))
 
-    @contextmanager
+    def _connect_readonly(self) -> sqlite3.Connection:
+        # immutable=1: no locking or change detection, the file is only replaced by fonctions.postal_db
+        conn = sqlite3.connect(
+            f"file:{self.db_path.resolve().as_posix()}?mode=ro&immutable=1",
+            uri=True,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        conn.execute(f"PRAGMA mmap_size = {Config.MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{Config.CACHE_SIZE_KIB}")
+        return conn
+
     def get_connection(self):
+        # Borrowed from the pool for one lookup or one batch, whatever thread runs it
+        return self._pool.connection()
+
+    @contextmanager
+    def get_write_connection(self):
         conn = sqlite3.connect(
             self.db_path,
             check_same_thread=False,
@@ -45,23 +90,86 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def dataset_version(self) -> str:
+        # Written by fonctions.postal_db; falls back to the file's mtime and size
+        with self.get_connection() as conn:
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'dataset_version'").fetchone()
+            except sqlite3.OperationalError:
+                row = None
+        if row:
+            return row[0]
+        stat = self.db_path.stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def close(self):
+        self._pool.close()
+
     def initialize(self) -> bool:
         if not self.db_path.exists():
             logger.error(f"Database not found: {self.db_path}")
-            st.error(f"Database not found: {self.db_path}")
+            st.error(f"Database not found: {self.db_path} (build it with: python -m fonctions.postal_db)")
             return False
         return True
 
-    def create_indexes(self):
-        with self.get_connection() as conn:
+    def create_indexes(self) -> bool:
+        # Checked once per manager: later reruns only pay for this attribute test
+        if self._schema_ok:
+            return True
+        with self.get_write_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_postal_code ON postal_codes(postal_code)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_city ON postal_codes(city)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_geolocation ON postal_codes(latitude, longitude)')
+            try:
+                # Tables and clustered keys come from fonctions.postal_db; only secondary indexes are ensured here
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_city_key ON postal_codes(city_key)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_geolocation ON postal_codes(latitude, longitude)')
+                self._schema_ok = self.verify_query_plans(cursor)
+                return self._schema_ok
+            except sqlite3.OperationalError as e:
+                logger.error(f"Outdated postal_codes schema: {e}")
+                st.error(f"Outdated database schema, rebuild it with: python -m fonctions.postal_db ({e})")
+                return False
+
+    @staticmethod
+    def verify_query_plans(cursor) -> bool:
+        # Each lookup must be a B-tree SEARCH, never a full SCAN
+        ok = True
+        queries = (
+            ('postal code', POSTAL_CODE_BATCH_QUERY.format('?')),
+            ('city', CITY_BATCH_QUERY.format('?')),
+        )
+        for name, query in queries:
+            plan = [row[-1] for row in cursor.execute(f'EXPLAIN QUERY PLAN {query}', ('',))]
+            if any(detail.startswith('SCAN') for detail in plan):
+                logger.warning(f"{name} lookup is not using an index: {plan}")
+                st.warning(f"The {name} lookup is scanning the whole table: {plan}")
+                ok = False
+        return ok
+
+@st.cache_resource(max_entries=1, on_release=DatabaseManager.close)
+def get_database_manager(db_path: Path, db_version: Tuple[int, int]) -> DatabaseManager:
+    # Shared by every session; a rebuilt database file (new mtime/size) gets a fresh manager and connections
+    return DatabaseManager(db_path)
+
+@dataclass
+class GeocodeResult:
+    identifier: str
+    status: str
+    location: Optional[Dict[str, Any]] = None
+
+    RESOLVED = 'resolved'
+    INVALID = 'invalid'
+    NOT_FOUND = 'not_found'
+    ERROR = 'error'
+
+@st.cache_resource(max_entries=1, on_release=GeocodeCache.close)
+def get_geocode_cache(dataset_version: str) -> GeocodeCache:
+    # Shared by every session; a new dataset version starts from a purged cache
+    return GeocodeCache(Config.GEOCODE_CACHE_PATH, dataset_version, Config.GEOCODE_CACHE_SIZE)
 
 class LocationService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, cache: Optional[GeocodeCache] = None):
         self.db_manager = db_manager
+        self.cache = cache
 
     @staticmethod
     def validate_coordinates(lat: float, lon: float) -> bool:
@@ -77,114 +185,214 @@ class LocationService:
             return False
         return bool(re.match(Config.POSTAL_CODE_PATTERN, code.upper()))
 
-    def get_coordinates(self, identifier: str) -> Optional[Dict[str, Any]]:
-        try:
-            identifier = identifier.strip()
-            
-            # Check if input is coordinates
-            if ',' in identifier:
-                try:
-                    lat, lon = map(float, map(str.strip, identifier.split(',')))
-                    if self.validate_coordinates(lat, lon):
-                        return {
-                            'lat': lat,
-                            'lon': lon,
-                            'type': 'coordinates',
-                            'address': f"Coordinates: {lat}, {lon}"
-                        }
-                except ValueError:
-                    pass
-
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cleaned_identifier = self.sanitize_input(identifier.upper().replace(' ', ''))
-                
-                if self.is_valid_postal_code(cleaned_identifier):
-                    cursor.execute('''
-                        SELECT * FROM postal_codes INDEXED BY idx_postal_code
-                        WHERE REPLACE(postal_code, " ", "") = ?
-                    ''', (cleaned_identifier,))
-                    result = cursor.fetchone()
-                    
-                    if result:
-                        return {
-                            'lat': float(result[4]),
-                            'lon': float(result[5]),
-                            'type': 'postal_code',
-                            'address': f"{result[1]}, {result[2]}"
-                        }
-                
-                cursor.execute('''
-                    SELECT * FROM postal_codes INDEXED BY idx_city
-                    WHERE UPPER(city) = ? 
-                    LIMIT 1
-                ''', (identifier.upper(),))
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'lat': float(result[4]),
-                        'lon': float(result[5]),
-                        'type': 'city',
-                        'address': f"{result[1]}, {result[2]}"
-                    }
-            
+    @staticmethod
+    def parse_coordinates(identifier: str) -> Optional[Tuple[float, float]]:
+        if ',' not in identifier:
             return None
-        except Exception as e:
-            logger.error(f"Error getting coordinates: {e}")
+        try:
+            lat, lon = map(float, map(str.strip, identifier.split(',')))
+        except ValueError:
             return None
+        return lat, lon
+
+    @staticmethod
+    def coordinates_location(lat: float, lon: float) -> Dict[str, Any]:
+        return {
+            'lat': lat,
+            'lon': lon,
+            'type': 'coordinates',
+            'address': f"Coordinates: {lat}, {lon}"
+        }
+
+    def geocode_batch(self, identifiers: List[str], conn: Optional[sqlite3.Connection] = None) -> List[GeocodeResult]:
+        # Set-based lookup: one IN (...) query per key type, results in input order
+        results: List[Optional[GeocodeResult]] = [None] * len(identifiers)
+        postal_keys: Dict[int, str] = {}
+        city_keys: Dict[int, str] = {}
+
+        for i, raw in enumerate(identifiers):
+            identifier = raw.strip()
+            coordinates = self.parse_coordinates(identifier)
+            if coordinates:
+                if self.validate_coordinates(*coordinates):
+                    results[i] = GeocodeResult(raw, GeocodeResult.RESOLVED, self.coordinates_location(*coordinates))
+                else:
+                    results[i] = GeocodeResult(raw, GeocodeResult.INVALID)
+                continue
+
+            cleaned_identifier = self.sanitize_input(identifier.upper().replace(' ', ''))
+            if not cleaned_identifier:
+                results[i] = GeocodeResult(raw, GeocodeResult.INVALID)
+                continue
+            if self.is_valid_postal_code(cleaned_identifier):
+                postal_keys[i] = normalize_postal_code(cleaned_identifier)
+            city_keys[i] = fold_city_name(identifier)
+
+        # Every identifier bound for the database has a city key; cached ones skip the queries
+        cache_keys = {i: normalize_cache_key(identifiers[i]) for i in city_keys} if self.cache is not None else {}
+        if cache_keys:
+            cached = self.cache.get_many(cache_keys.values())
+            for i, key in cache_keys.items():
+                if key in cached:
+                    location = cached[key]
+                    status = GeocodeResult.RESOLVED if location else GeocodeResult.NOT_FOUND
+                    results[i] = GeocodeResult(identifiers[i], status, location)
+                    postal_keys.pop(i, None)
+                    del city_keys[i]
+
+        with self.db_manager.get_connection() if conn is None else nullcontext(conn) as conn:
+            cursor = conn.cursor()
+            rows = self.fetch_by_keys(cursor, POSTAL_CODE_BATCH_QUERY, postal_keys.values())
+            for i, key in postal_keys.items():
+                if key in rows:
+                    results[i] = GeocodeResult(identifiers[i], GeocodeResult.RESOLVED, self.row_location(rows[key], 'postal_code'))
+
+            # Anything not resolved as a postal code is tried as a city
+            pending = {i: key for i, key in city_keys.items() if results[i] is None}
+            rows = self.fetch_by_keys(cursor, CITY_BATCH_QUERY, pending.values())
+            for i, key in pending.items():
+                if key in rows:
+                    results[i] = GeocodeResult(identifiers[i], GeocodeResult.RESOLVED, self.row_location(rows[key], 'city'))
+                else:
+                    results[i] = GeocodeResult(identifiers[i], GeocodeResult.NOT_FOUND)
+
+        if cache_keys:
+            self.cache.put_many({cache_keys[i]: results[i].location for i in city_keys})
+        return results
+
+    @staticmethod
+    def fetch_by_keys(cursor, query: str, keys: Iterable[str]) -> Dict[str, Tuple]:
+        keys = list(set(keys))
+        rows = {}
+        for i in range(0, len(keys), Config.BATCH_SIZE):
+            chunk = keys[i:i+Config.BATCH_SIZE]
+            cursor.execute(query.format(', '.join('?' * len(chunk))), chunk)
+            rows.update((row[0], row[1:]) for row in cursor.fetchall())
+        return rows
+
+    @staticmethod
+    def row_location(row: Tuple, location_type: str) -> Dict[str, Any]:
+        city, province, lat, lon = row
+        return {
+            'lat': float(lat),
+            'lon': float(lon),
+            'type': location_type,
+            'address': f"{city}, {province}"
+        }
+
+@st.cache_resource(on_release=lambda executor: executor.shutdown(wait=False, cancel_futures=True))
+def get_geocode_executor() -> ThreadPoolExecutor:
+    # One pool of MAX_WORKERS threads for every session and click, instead of one per "Show Map"
+    return ThreadPoolExecutor(max_workers=Config.MAX_WORKERS, thread_name_prefix="geocode")
 
 class MapService:
-    def __init__(self, location_service: LocationService):
+    def __init__(self, location_service: LocationService, executor: ThreadPoolExecutor):
         self.location_service = location_service
+        self.executor = executor
 
-    def process_location_batch(self, locations_batch: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
-        return [(loc, self.location_service.get_coordinates(loc)) for loc in locations_batch]
-
-    def create_map(self, locations: List[str]) -> folium.Map:
-        m = folium.Map(location=Config.INITIAL_LOCATION, zoom_start=7)
-        
-        batch_size = min(Config.BATCH_SIZE, max(1, len(locations) // Config.MAX_WORKERS))
-        batches = [locations[i:i+batch_size] for i in range(0, len(locations), batch_size)]
-        
-        progress_bar = st.progress(0)
-        
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            futures = [executor.submit(self.process_location_batch, batch) for batch in batches]
-            results = []
-            
-            for i, future in enumerate(futures):
+    def iter_geocoded(self, locations: List[str]) -> Iterator[Tuple[int, List[GeocodeResult]]]:
+        # Batches run in parallel (each on a pooled read-only connection) and are yielded
+        # as (offset, results) in completion order, so one slow batch does not hold back the others
+        size = Config.STREAM_BATCH_SIZE
+        futures = {
+            self.executor.submit(self.location_service.geocode_batch, locations[i:i+size]): i
+            for i in range(0, len(locations), size)
+        }
+        try:
+            for future in as_completed(futures):
+                start = futures[future]
                 try:
-                    results.extend(future.result())
-                    progress_bar.progress((i + 1) / len(batches))
+                    yield start, future.result()
                 except Exception as e:
                     logger.error(f"Batch processing error: {e}")
+                    yield start, [GeocodeResult(loc, GeocodeResult.ERROR) for loc in locations[start:start+size]]
+        finally:
+            # Rerun or error in the consumer: drop the batches not started yet, the pool is shared
+            for future in futures:
+                future.cancel()
 
-        for identifier, location in results:
-            if location:
-                folium.Marker(
-                    [location['lat'], location['lon']],
-                    popup=f"{'Postal Code' if location['type'] == 'postal_code' else 'City'}: {identifier}<br>Address: {location['address']}",
-                    icon=folium.Icon(
-                        color='green' if location['type'] == 'coordinates' 
-                        else 'red' if location['type'] == 'postal_code' 
-                        else 'blue',
-                        icon='info-sign'
-                    )
-                ).add_to(m)
-        
+    def geocode_locations(
+        self,
+        locations: List[str],
+        on_progress: Optional[Callable[[int, List[GeocodeResult]], None]] = None
+    ) -> List[GeocodeResult]:
+        # Results are placed back in input order; on_progress(done, batch_results) runs after each batch
+        results: List[Optional[GeocodeResult]] = [None] * len(locations)
+        done = 0
+        for start, batch_results in self.iter_geocoded(locations):
+            results[start:start+len(batch_results)] = batch_results
+            done += len(batch_results)
+            if on_progress:
+                on_progress(done, batch_results)
+        return results
+
+    @staticmethod
+    def plan_visit_order(results: List[GeocodeResult]) -> Tuple[Route, List[Dict[str, Any]]]:
+        # Route over the resolved locations, starting from the first one entered
+        resolved = [result for result in results if result and result.location]
+        return route_steps(
+            [r.location['lat'] for r in resolved],
+            [r.location['lon'] for r in resolved],
+            [r.identifier for r in resolved],
+            Config.ROUTE_LABELS,
+        )
+
+    def create_map(self, results: List[GeocodeResult], display_mode: Optional[str] = None, route: Optional[Route] = None) -> folium.Map:
+        m = folium.Map(location=Config.INITIAL_LOCATION, zoom_start=7)
+        resolved = [result for result in results if result and result.location]
+        if display_mode == 'geojson':
+            # One FeatureCollection; colours and popups are built in the browser from the properties
+            features = [
+                (r.location['lat'], r.location['lon'], r.location['type'], r.identifier, r.location['address'])
+                for r in resolved
+            ]
+            add_geojson_markers(m, features, Config.LOCATION_LABELS, default_label='City', address_label='Address')
+        else:
+            # User input is escaped: the rendered map is shared with every session (?map=)
+            points = [
+                (
+                    result.location['lat'],
+                    result.location['lon'],
+                    result.location['type'],
+                    f"{Config.LOCATION_LABELS.get(result.location['type'], 'City')}: {html.escape(result.identifier)}<br>Address: {result.location['address']}"
+                )
+                for result in resolved
+            ]
+            if display_mode:
+                # One circle per FSA (or grid cell) instead of one marker per point
+                keys = [fsa_key(result.identifier, result.location['type']) for result in resolved] if display_mode == 'fsa' else None
+                add_aggregated_layer(m, points, keys)
+            else:
+                # Clustered, browser-side markers above the threshold
+                add_location_markers(m, points)
+        if route is not None:
+            add_route_line(m, [(r.location['lat'], r.location['lon']) for r in resolved], route)
         return m
 
+@st.cache_resource
+def get_map_cache() -> RenderedMapCache:
+    # Rendered maps shared by every session: same normalized list = no geocoding, no rendering
+    return RenderedMapCache()
+
 class StreamlitApp:
     def __init__(self):
-        self.db_manager = DatabaseManager(Config.DB_FILE_PATH)
-        self.location_service = LocationService(self.db_manager)
-        self.map_service = MapService(self.location_service)
+        self.db_version: Tuple[int, int] = (0, 0)
+        self.db_manager: Optional[DatabaseManager] = None
+        self.geocode_cache: Optional[GeocodeCache] = None
+        self.location_service: Optional[LocationService] = None
+        self.map_service: Optional[MapService] = None
 
     def initialize(self) -> bool:
-        if not self.db_manager.initialize():
+        db_path = Config.DB_FILE_PATH
+        if db_path.exists():
+            stat = db_path.stat()
+            self.db_version = (stat.st_mtime_ns, stat.st_size)
+        self.db_manager = get_database_manager(db_path, self.db_version)
+        if not self.db_manager.initialize() or not self.db_manager.create_indexes():
             return False
-        self.db_manager.create_indexes()
+        self.geocode_cache = get_geocode_cache(self.db_manager.dataset_version())
+        self.location_service = LocationService(self.db_manager, self.geocode_cache)
+        self.map_service = MapService(self.location_service, get_geocode_executor())
         return True
 
     def run(self):
@@ -204,18 +412,110 @@ class StreamlitApp:
             help="Format: Code postal (G0J 1J0) ou Ville (Montréal) ou Coordonnées (45.5017, -73.5673)"
         )
 
+        display_mode = Config.DISPLAY_MODES[st.radio("Display", list(Config.DISPLAY_MODES), horizontal=True)]
+        with_route = st.checkbox("Visit order (route)")
+        map_cache = get_map_cache()
+
         if st.button("Show Map", type="primary"):
             locations = [loc.strip() for loc in locations_input.split('\n') if loc.strip()]
             if locations:
-                with st.spinner("Creating map..."):
-                    try:
-                        m = self.map_service.create_map(locations)
-                        folium_static(m, width=800, height=600)
-                        st.caption('data source: https://codes-postaux.cybo.com/ ')
-                    except Exception as e:
-                        st.error(f"Error creating map: {e}")
+                try:
+                    key = map_cache_key(locations, width=Config.MAP_WIDTH, height=Config.MAP_HEIGHT, dataset=self.db_version, display=display_mode, route=with_route)
+                    cached = map_cache.get(key)
+                    if cached is None:
+                        results = self.geocode_with_preview(locations)
+                        with st.spinner("Creating map..."):
+                            route, steps = self.map_service.plan_visit_order(results) if with_route else (None, [])
+                            map_html = render_map_html(self.map_service.create_map(results, display_mode, route))
+                            cached = map_cache.put(key, map_html, {'results': results, 'route': steps})
+                    # Shareable link: ?map=<key> shows the cached map again
+                    st.query_params["map"] = key
+                    self.show_cached_map(cached)
+                except Exception as e:
+                    st.error(f"Error creating map: {e}")
             else:
                 st.warning("Please enter at least one location.")
+        elif "map" in st.query_params:
+            cached = map_cache.get(st.query_params["map"])
+            if cached:
+                self.show_cached_map(cached)
+            else:
+                st.info("This map is no longer cached, enter the locations again to rebuild it.")
+
+        self.show_cache_stats()
+
+    def show_cache_stats(self):
+        stats = self.geocode_cache.stats()
+        with st.sidebar:
+            st.subheader("Geocoding cache")
+            st.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+            col1, col2 = st.columns(2)
+            col1.metric("Memory hits", stats['memory_hits'])
+            col2.metric("Disk hits", stats['disk_hits'])
+            col1.metric("Misses", stats['misses'])
+            col2.metric("Evictions", stats['evictions'])
+            st.caption(f"{stats['memory_entries']} entries in memory, dataset {self.geocode_cache.dataset_version}")
+
+    def geocode_with_preview(self, locations: List[str]) -> List[GeocodeResult]:
+        # Progress follows real completion counts. Each batch only appends its own points to the
+        # preview; the (client-side rendered) preview is refreshed once the point count has doubled,
+        # so the points sent over all refreshes stay proportional to the number of locations
+        progress_bar = st.progress(0.0)
+        preview = st.empty()
+        points: List[Tuple[float, float]] = []
+        shown = 0
+
+        def on_progress(done: int, batch_results: List[GeocodeResult]):
+            nonlocal shown
+            progress_bar.progress(done / len(locations), text=f"{done}/{len(locations)} locations processed")
+            points.extend((r.location['lat'], r.location['lon']) for r in batch_results if r.location)
+            if done < len(locations) and len(points) >= max(2 * shown, 1):
+                preview.map(
+                    {'lat': [lat for lat, _ in points], 'lon': [lon for _, lon in points]},
+                    width=Config.MAP_WIDTH, height=Config.MAP_HEIGHT, size=200
+                )
+                shown = len(points)
+
+        results = self.map_service.geocode_locations(locations, on_progress)
+        preview.empty()
+        progress_bar.empty()
+        return results
+
+    def show_cached_map(self, cached):
+        components.html(cached.html, height=Config.MAP_HEIGHT + 10, width=Config.MAP_WIDTH)
+        self.show_route(cached.payload['route'])
+        st.caption('data source: https://codes-postaux.cybo.com/ ')
+        self.show_status_summary(cached.payload['results'])
+
+    @staticmethod
+    def show_route(steps: List[Dict[str, Any]]):
+        if not steps:
+            return
+        st.markdown(f"**Route: {steps[-1][Config.ROUTE_LABELS['total_km']]:.1f} km, {len(steps)} stops** (straight-line distances)")
+        with st.expander("Visit order"):
+            st.dataframe(steps, hide_index=True)
+            if len(steps) <= Config.MAX_MATRIX_DOWNLOAD:
+                # Distance matrix, rows and columns in visit order
+                st.download_button("Distance matrix (CSV)", distance_matrix_csv(steps, Config.ROUTE_LABELS), "distances.csv", "text/csv")
+
+    @staticmethod
+    def show_status_summary(results: List[GeocodeResult]):
+        counts = {
+            status: 0
+            for status in (GeocodeResult.RESOLVED, GeocodeResult.NOT_FOUND, GeocodeResult.INVALID, GeocodeResult.ERROR)
+        }
+        for result in results:
+            counts[result.status] += 1
+        st.success(
+            f"{counts[GeocodeResult.RESOLVED]} resolved, "
+            f"{counts[GeocodeResult.NOT_FOUND]} not found, "
+            f"{counts[GeocodeResult.INVALID]} invalid"
+            + (f", {counts[GeocodeResult.ERROR]} failed" if counts[GeocodeResult.ERROR] else "")
+        )
+        unresolved = [result for result in results if result.status != GeocodeResult.RESOLVED]
+        if unresolved:
+            with st.expander("Unresolved locations"):
+                st.table([{'Location': r.identifier, 'Status': r.status} for r in unresolved])
 
 if __name__ == "__main__":
     app = StreamlitApp()